@@ -0,0 +1,88 @@
+import os
+
+import pygame
+
+import atlas
+
+
+class AssetRegistry:
+    """Process-wide registry that loads every sprite under assets/ once and shares it between sprites
+
+    The sprites come from the packed atlas built by atlas.py when it is there and up to date, otherwise from the png
+    files themselves"""
+
+    def __init__(self, root="assets", atlas_path=atlas.ATLAS_FILE):
+        self.root = root
+        # images and masks are keyed by their path relative to the root without the extension,
+        # e.g. "cactus/cactus-3" or "cactus/cactus-3-shot"
+        self.images = {}
+        self.masks = {}
+        self.converted = False
+        # the atlas sheet, the rect of each image on it and the mapping holding its pixels
+        self.sheet = None
+        self.rects = {}
+        self.mapping = None
+        if atlas_path is not None and not atlas.is_stale(root, atlas_path):
+            self._load_atlas(atlas_path)
+        else:
+            self._load()
+
+    def image(self, name):
+        """Returns the cached surface of the given asset name"""
+        return self.images[name]
+
+    def mask(self, name):
+        """Returns the collision mask of the given asset name, it is computed on first use as only a few sprites
+        collide"""
+        mask = self.masks.get(name)
+        if mask is None:
+            mask = self.masks[name] = pygame.mask.from_surface(self.images[name])
+        return mask
+
+    def convert(self):
+        """Converting the cached surfaces to the display pixel format, this only works once a display mode is set
+        so the registry can be created before the window and converted afterwards"""
+        if self.converted or pygame.display.get_surface() is None:
+            return
+        if self.sheet is not None:
+            # the mapped sheet is already in the format of usual 32 bit displays, it is only converted, as a whole,
+            # for the other ones
+            display = pygame.display.get_surface()
+            if display.get_bitsize() != 32 or display.get_masks()[:3] != self.sheet.get_masks()[:3]:
+                self._slice(self.sheet.convert_alpha())
+        else:
+            for name, image in self.images.items():
+                self.images[name] = image.convert_alpha()
+        self.converted = True
+
+    def _load(self):
+        """Loading all png files under the root"""
+        for directory, _, files in os.walk(self.root):
+            for file in sorted(files):
+                if not file.endswith(".png"):
+                    continue
+                path = os.path.join(directory, file)
+                name = os.path.splitext(os.path.relpath(path, self.root))[0].replace(os.sep, "/")
+                self.images[name] = pygame.image.load(path)
+
+    def _load_atlas(self, path):
+        """Mapping the atlas and slicing it into a subsurface per image, nothing is decoded"""
+        sheet, self.rects, self.mapping = atlas.load(path)
+        self._slice(sheet)
+
+    def _slice(self, sheet):
+        self.sheet = sheet
+        for name, rect in self.rects.items():
+            self.images[name] = sheet.subsurface(rect)
+
+
+_registry = None
+
+
+def get_assets():
+    """Returns the shared asset registry, loading it on first use and converting it if a display is available"""
+    global _registry
+    if _registry is None:
+        _registry = AssetRegistry()
+    _registry.convert()
+    return _registry
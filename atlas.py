@@ -0,0 +1,119 @@
+"""Packed sprite atlas
+
+Every png under assets/ is packed into a single sheet of raw BGRA pixels, the 32 bit format of convert_alpha on usual
+displays, with an index of the rect of each image. At startup the atlas is memory mapped and sliced into subsurfaces,
+so no image is decoded:
+
+    python atlas.py    # build assets.atlas from assets/, run it again whenever an image changes
+"""
+import mmap
+import os
+import struct
+import sys
+import time
+
+import pygame
+
+ATLAS_FILE = "assets.atlas"
+MAGIC = b"TRXA"
+VERSION = 1
+# magic, version, sheet width, sheet height, image count, offset of the pixels from the start of the file
+HEADER = struct.Struct("<4sBHHHI")
+# x, y, width, height and name length of each image, followed by its name
+ENTRY = struct.Struct("<HHHHB")
+
+
+def _pngs(root):
+    """Returns the (name, path) of every png under root, the name being its path relative to root without the
+    extension"""
+    pngs = []
+    for directory, _, files in os.walk(root):
+        for file in sorted(files):
+            if file.endswith(".png"):
+                path = os.path.join(directory, file)
+                pngs.append((os.path.splitext(os.path.relpath(path, root))[0].replace(os.sep, "/"), path))
+    return pngs
+
+
+def _pack(sizes, width):
+    """Placing the images on shelves from the tallest to the shortest, returns the position of each image and the
+    height of the sheet"""
+    positions = {}
+    x = y = shelf_height = 0
+    for name, (w, h) in sorted(sizes.items(), key=lambda item: (-item[1][1], item[0])):
+        if x + w > width:
+            x = 0
+            y += shelf_height
+            shelf_height = 0
+        positions[name] = (x, y)
+        x += w
+        shelf_height = max(shelf_height, h)
+    return positions, y + shelf_height
+
+
+def build(root="assets", path=ATLAS_FILE):
+    """Packing every png under root into the atlas at path, returns the number of packed images"""
+    images = {name: pygame.image.load(png) for name, png in _pngs(root)}
+    sizes = {name: image.get_size() for name, image in images.items()}
+    width = max(max(w for w, _ in sizes.values()), 1024)
+    positions, height = _pack(sizes, width)
+    sheet = pygame.Surface((width, height), pygame.SRCALPHA, 32)
+    sheet.fill((0, 0, 0, 0))
+    index = b""
+    for name, image in images.items():
+        sheet.blit(image, positions[name])
+        encoded = name.encode()
+        index += ENTRY.pack(*positions[name], *sizes[name], len(encoded)) + encoded
+    # the pixels start on a 64 bytes boundary so their rows stay aligned once mapped
+    offset = -(-(HEADER.size + len(index)) // 64) * 64
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, width, height, len(images), offset))
+        file.write(index)
+        file.write(b"\0" * (offset - HEADER.size - len(index)))
+        file.write(pygame.image.tostring(sheet, "BGRA"))
+    os.replace(temp_path, path)
+    return len(images)
+
+
+def is_stale(root="assets", path=ATLAS_FILE):
+    """Returns whether the atlas is missing or older than one of the pngs under root"""
+    try:
+        built = os.path.getmtime(path)
+    except OSError:
+        return True
+    return any(os.path.getmtime(png) > built for _, png in _pngs(root))
+
+
+def load(path=ATLAS_FILE):
+    """Mapping the atlas and returning its sheet surface, the rect of each image as {name: (x, y, w, h)} and the
+    mapping itself, which has to be kept as long as the sheet is used
+
+    The sheet reads its pixels straight from the mapping, a copy-on-write one so drawing on a surface of the atlas
+    never changes the file"""
+    with open(path, "rb") as file:
+        mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+    magic, version, width, height, count, offset = HEADER.unpack_from(mapping)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} atlas")
+    rects = {}
+    position = HEADER.size
+    for _ in range(count):
+        x, y, w, h, length = ENTRY.unpack_from(mapping, position)
+        position += ENTRY.size
+        rects[bytes(mapping[position:position + length]).decode()] = (x, y, w, h)
+        position += length
+    sheet = pygame.image.frombuffer(memoryview(mapping)[offset:offset + width * height * 4], (width, height), "BGRA")
+    return sheet, rects, mapping
+
+
+def main():
+    start = time.perf_counter()
+    count = build()
+    print(f"packed {count} images into {ATLAS_FILE} ({os.path.getsize(ATLAS_FILE) // 1024} KiB) in "
+          f"{time.perf_counter() - start:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,371 @@
+import numpy as np
+import pygame
+
+from assets import get_assets
+from engine import CROUCH, JUMP, SHOOT
+from settings import Settings
+from trex_game_sprites import jump_height
+
+# obstacle kinds stored in BatchTRexEnv.kind
+EMPTY = 0
+CACTUS = 1
+BIRD = 2
+# sprite ids 0 - 12 are the cacti images, the bird always collides with its first image
+BIRD_SPRITE = 13
+CACTUS_IDS = 13
+
+
+def _round(values):
+    """Rounding half away from zero, the way pygame.Rect stores float coordinates"""
+    return np.trunc(values + np.copysign(0.5, values)).astype(np.int32)
+
+
+def _overlap_table(mask, masks, max_width, max_height):
+    """Precomputing whether mask overlaps each of masks for every offset between their top lefts
+    table[i, dx + max_width - 1, dy + max_height - 1] is True when masks[i] placed at (dx, dy) relative to mask
+    overlaps it, the correlation is computed once with an fft instead of calling Mask.overlap per pair and frame"""
+    width, height = mask.shape
+    shape = (width + max_width - 1, height + max_height - 1)
+    table = np.zeros((len(masks),) + shape, dtype=bool)
+    mask_fft = np.fft.rfft2(mask.astype(np.float64), shape)
+    for i, other in enumerate(masks):
+        padded = np.zeros((max_width, max_height))
+        padded[:other.shape[0], :other.shape[1]] = other
+        correlation = np.fft.irfft2(mask_fft * np.conj(np.fft.rfft2(padded, shape)), shape)
+        # the correlation is circular, rolling it puts offset (-(max_width - 1), -(max_height - 1)) at index (0, 0)
+        table[i] = np.roll(correlation, (max_width - 1, max_height - 1), axis=(0, 1)) > 0.5
+    return table
+
+
+def _mask_array(image):
+    """Returns the collision mask of an image as a (width, height) bool array, same threshold as pygame.mask"""
+    return pygame.surfarray.array_alpha(image) > 127
+
+
+class BatchTRexEnv:
+    """N independent T-Rex games stepped in lockstep, the game state lives in NumPy arrays and the trex physics,
+    the scrolling and the collision tests are applied to all games at once
+
+    It follows the rules of engine.TRexEngine for the trex, the bullets, the score and the difficulty, the decorative
+    ground, clouds, stars and moon are not simulated. It differs from the engine in two ways, so its games do not
+    match the engine games of the same seed:
+    - the obstacles are drawn from a NumPy generator each frame with the rules the engine used before the spawns.py
+      timeline, a cacti group or a bird at a time and birds after 450 deciseconds
+    - the collisions are only tested at the end positions of each frame, the obstacles are not swept like the
+      collision module does for fast sprites, so above about 30 pixels per frame they can pass through the trex"""
+
+    def __init__(self, n, seed=None, settings=None, max_obstacles=8, max_bullets=8, auto_reset=True):
+        self.n = n
+        self.settings = Settings() if settings is None else settings
+        self.rng = np.random.default_rng(seed)
+        self.max_obstacles = max_obstacles
+        self.max_bullets = max_bullets
+        # games that are over are reset at the beginning of the next step
+        self.auto_reset = auto_reset
+        self.frame_time = 1000 / self.settings.tick_rate
+        self._init_geometry()
+        self._init_state()
+        self.reset()
+
+    def _init_geometry(self):
+        """Measuring the sprites and precomputing the collision tables from the shared asset registry"""
+        assets = get_assets()
+        screen_width, screen_height = self.settings.screen_dimen
+        self.screen_width = screen_width
+        ground = assets.image("ground/ground").get_rect()
+        ground.y = screen_height * 0.75
+        trex = assets.image("t-rex/t-rex-0").get_rect()
+        # same placement as TRex, its rect keeps the size of the jump image whatever image is shown
+        self.trex_x = trex.width // 2
+        self.trex_width = trex.width
+        self.trex_height = trex.height
+        self.trex_base_y = ground.y - ground.height
+        self.trex_walk_y = _round(np.float64(self.trex_base_y - trex.height * 0.5))
+        self.trex_crouch_y = _round(np.float64(self.trex_base_y - trex.height * 0.12))
+
+        images = [assets.image(f"cactus/cactus-{i}") for i in range(CACTUS_IDS)] + [assets.image("bird/bird-1")]
+        self.sprite_width = np.array([image.get_width() for image in images], dtype=np.int32)
+        self.sprite_height = np.array([image.get_height() for image in images], dtype=np.int32)
+        # cacti stand on the middle of the ground, see Cactus
+        cactus_center_y = ground.y + ground.height / 2 - self.sprite_height / 3
+        self.cactus_y = _round(cactus_center_y) - self.sprite_height // 2
+        # the three heights a bird can fly at, see TRexEngine.update, the last one follows the trex top
+        self.bird_ys = np.array([ground.y - trex.height - ground.height * 0.75,
+                                 ground.bottom - self.sprite_height[BIRD_SPRITE]])
+
+        self.max_width = int(self.sprite_width.max())
+        self.max_height = int(self.sprite_height.max())
+        masks = [_mask_array(image) for image in images]
+        self.trex_table = _overlap_table(_mask_array(assets.image("t-rex/t-rex-0")), masks,
+                                         self.max_width, self.max_height)
+        # bullets are plain filled rects so their mask is full
+        bullet = np.ones((self.settings.bullet_width, self.settings.bullet_height), dtype=bool)
+        self.bullet_table = _overlap_table(bullet, masks, self.max_width, self.max_height)
+
+    def _init_state(self):
+        n, m, b = self.n, self.max_obstacles, self.max_bullets
+        # trex
+        self.trex_y = np.zeros(n, dtype=np.int32)
+        # a float as it steps by less than 1 above 60 ticks per second, see Settings.per_tick
+        self.jump_count = np.zeros(n)
+        self.jumping = np.zeros(n, dtype=bool)
+        self.crouching = np.zeros(n, dtype=bool)
+        self.collided = np.zeros(n, dtype=bool)
+        # obstacles
+        self.kind = np.zeros((n, m), dtype=np.int8)
+        self.sprite = np.zeros((n, m), dtype=np.int32)
+        self.x = np.zeros((n, m), dtype=np.int32)
+        # the left edges keep the fractions of a pixel like Cactus.x, x is rounded from them
+        self.left = np.zeros((n, m))
+        self.y = np.zeros((n, m), dtype=np.int32)
+        self.damaged = np.zeros((n, m), dtype=bool)
+        self.cacti_count = np.zeros(n, dtype=np.int32)
+        # bullets, the left and top are kept as floats just like Bullet does
+        self.bullet_active = np.zeros((n, b), dtype=bool)
+        self.bullet_left = np.zeros((n, b))
+        self.bullet_top = np.zeros((n, b))
+        self.bullet_x = np.zeros((n, b), dtype=np.int32)
+        self.bullet_y = np.zeros((n, b), dtype=np.int32)
+        # velocities and bullet count grow per game with the difficulty
+        self.ground_velocity = np.zeros(n)
+        self.bird_velocity = np.zeros(n)
+        self.bullet_count = np.zeros(n, dtype=np.int32)
+        # time and score
+        self.frames = np.zeros(n, dtype=np.int64)
+        self.addition = np.zeros(n, dtype=np.int64)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.current_mile_stone = np.zeros(n, dtype=np.int64)
+        self.should_not_play_sound = np.zeros(n, dtype=bool)
+        self.kills = np.zeros(n, dtype=np.int64)
+
+    def reset(self, which=None):
+        """Resets every game or the games selected by a bool mask / index array and returns the observation"""
+        which = slice(None) if which is None else which
+        self.trex_y[which] = self.trex_walk_y
+        self.jump_count[which] = self.settings.jump_count
+        self.jumping[which] = False
+        self.crouching[which] = False
+        self.collided[which] = False
+        self.kind[which] = EMPTY
+        self.damaged[which] = False
+        self.cacti_count[which] = 0
+        self.bullet_active[which] = False
+        # starting from the velocities and bullet count of the settings, like TRexEngine.reset
+        self.settings.reset_difficulty()
+        self.ground_velocity[which] = self.settings.ground_velocity
+        self.bird_velocity[which] = self.settings.bird_velocity
+        self.bullet_count[which] = self.settings.bullet_count
+        self.frames[which] = 0
+        self.addition[which] = 0
+        self.score[which] = 0
+        self.current_mile_stone[which] = 0
+        self.should_not_play_sound[which] = False
+        self.kills[which] = 0
+        return self.observation()
+
+    def step(self, actions):
+        """Plays one action per game and advances every running game by one frame, returns a tuple of
+        (observation, rewards, dones) arrays"""
+        if self.auto_reset and self.collided.any():
+            self.reset(self.collided.copy())
+        actions = np.asarray(actions)
+        running = ~self.collided
+        self._apply_actions(actions, running)
+        score = self.score.copy()
+
+        self.frames[running] += 1
+        ticks = (self.frames * self.frame_time).astype(np.int64)
+        deci = ticks // 100
+        self._update_score(np.where(running, deci + self.addition, self.score), running)
+        # showing birds only after 450 deciseconds, before that the sprite type is always a cactus
+        bird_type = (deci > 450) & (self.rng.random(self.n) < 0.5)
+
+        self._update_trex(running)
+        self._check_collisions(running)
+        self._spawn(running, deci, bird_type)
+        self._move(running)
+        return self.observation(), self.score - score, self.collided.copy()
+
+    def observation(self):
+        """Returns the live state arrays of every game, copy them if they should outlive the next step"""
+        return {
+            "trex_y": self.trex_y,
+            "jumping": self.jumping,
+            "crouching": self.crouching,
+            "kind": self.kind,
+            "x": self.x,
+            "y": self.y,
+            "width": self.sprite_width[self.sprite],
+            "height": self.sprite_height[self.sprite],
+            "ground_velocity": self.ground_velocity,
+            "bird_velocity": self.bird_velocity,
+            "bullets": self.bullet_count - self.bullet_active.sum(axis=1),
+            "score": self.score,
+        }
+
+    def _apply_actions(self, actions, running):
+        jump = running & (actions == JUMP)
+        crouch = running & (actions == CROUCH)
+        self.jumping |= jump
+        self.jumping &= ~crouch
+        # crouching only lasts as long as the crouch action is held, same as TRexEngine.step
+        self.crouching[:] = crouch
+
+        # firing into the first free bullet slot if the gun is not empty
+        shoot = running & (actions == SHOOT)
+        shoot &= self.bullet_active.sum(axis=1) < np.minimum(self.bullet_count, self.max_bullets)
+        if shoot.any():
+            slot = np.argmin(self.bullet_active, axis=1)
+            rows = np.nonzero(shoot)[0]
+            slot = slot[rows]
+            # placing the bullet just in front of the trex gun, see Bullet
+            top = self.trex_y[rows] + self.trex_height * 0.4361
+            self.bullet_active[rows, slot] = True
+            self.bullet_left[rows, slot] = self.trex_x + self.trex_width
+            self.bullet_top[rows, slot] = top
+            self.bullet_x[rows, slot] = self.trex_x + self.trex_width
+            self.bullet_y[rows, slot] = _round(top)
+
+    def _update_score(self, score, running):
+        """Milestones every 100 points increase the difficulty, see TRexEngine._update_score"""
+        passed = running & (score >= 100) & ((score % 100 == 0) | (score - self.current_mile_stone >= 100))
+        self.current_mile_stone[passed] = score[passed]
+        increase = passed & ~self.should_not_play_sound
+        self.should_not_play_sound[running] = passed[running]
+        if increase.any():
+            scale = 1 + self.settings.difficulty_scale
+            self.ground_velocity[increase] *= scale
+            self.bird_velocity[increase] *= scale
+            self.bullet_count[increase] += self.rng.integers(0, 2, increase.sum())
+        self.score[:] = score
+
+    def _update_trex(self, running):
+        """Applying TRex.update to every game"""
+        walking = running & ~self.jumping & ~self.crouching
+        crouching = running & self.crouching & ~self.jumping
+        self.trex_y[walking] = self.trex_walk_y
+        self.trex_y[crouching] = self.trex_crouch_y
+        self.jump_count[crouching] = self.settings.jump_count
+
+        jumping = running & self.jumping
+        airborne = jumping & (self.jump_count >= -self.settings.jump_count)
+        landed = jumping & ~airborne
+        count = self.jump_count[airborne]
+        status = np.where(count < 0, -1, 1)
+        step = self.settings.per_tick(1)
+        rise = jump_height(np.abs(count)) - jump_height(np.abs(count) - step)
+        self.trex_y[airborne] = _round(self.trex_y[airborne] - rise * status)
+        self.jump_count[airborne] -= step
+        self.jumping[landed] = False
+        self.jump_count[landed] = self.settings.jump_count
+
+    def _check_collisions(self, running):
+        """Broad phase with rect overlaps over all games and obstacles, then looking up the precomputed masks
+        overlap of the candidates"""
+        alive = (self.kind != EMPTY) & running[:, None]
+        width = self.sprite_width[self.sprite]
+        height = self.sprite_height[self.sprite]
+
+        # trex against obstacles
+        dx = self.x - self.trex_x
+        dy = self.y - self.trex_y[:, None]
+        candidates = alive & (dx < self.trex_width) & (dx + width > 0) & (dy < self.trex_height) & (dy + height > 0)
+        hits = np.zeros_like(candidates)
+        if candidates.any():
+            rows, cols = np.nonzero(candidates)
+            hits[rows, cols] = self.trex_table[self.sprite[rows, cols],
+                                               dx[rows, cols] + self.max_width - 1,
+                                               dy[rows, cols] + self.max_height - 1]
+        self.collided |= hits.any(axis=1)
+        self.kind[hits] = EMPTY
+
+        # bullets against obstacles, each pair is (game, bullet, obstacle)
+        alive = self.kind != EMPTY
+        if not self.bullet_active.any() or not alive.any():
+            return
+        bullet_width, bullet_height = self.settings.bullet_width, self.settings.bullet_height
+        dx = self.x[:, None, :] - self.bullet_x[:, :, None]
+        dy = self.y[:, None, :] - self.bullet_y[:, :, None]
+        candidates = (alive[:, None, :] & self.bullet_active[:, :, None] & running[:, None, None] &
+                      (dx < bullet_width) & (dx + width[:, None, :] > 0) &
+                      (dy < bullet_height) & (dy + height[:, None, :] > 0))
+        if not candidates.any():
+            return
+        games, bullets, obstacles = np.nonzero(candidates)
+        overlap = self.bullet_table[self.sprite[games, obstacles],
+                                    dx[games, bullets, obstacles] + self.max_width - 1,
+                                    dy[games, bullets, obstacles] + self.max_height - 1]
+        games, bullets, obstacles = games[overlap], bullets[overlap], obstacles[overlap]
+        self.bullet_active[games, bullets] = False
+        # the first hit damages an obstacle and the second one kills it, giving 4 points for a cactus and 8 for a bird
+        shots = np.zeros(self.kind.shape, dtype=np.int32)
+        np.add.at(shots, (games, obstacles), 1)
+        shot = shots > 0
+        killed = shot & (shots + self.damaged >= 2)
+        self.damaged |= shot
+        self.addition += np.where(killed, np.where(self.kind == BIRD, 8, 4), 0).sum(axis=1)
+        self.kills += killed.sum(axis=1)
+        self.kind[killed] = EMPTY
+
+    def _spawn(self, running, deci, bird_type):
+        """Spawning cacti groups and birds with the same rules as TRexEngine.update"""
+        cacti = (self.kind == CACTUS).sum(axis=1)
+        birds = (self.kind == BIRD).sum(axis=1)
+        spawn_cacti = running & ~bird_type & (birds == 0) & (
+                ((deci > 40) & (self.cacti_count == 0)) | (cacti < self.cacti_count))
+        spawn_bird = running & bird_type & (cacti == 0) & (birds == 0)
+        if spawn_cacti.any():
+            self._spawn_cacti(np.nonzero(spawn_cacti)[0])
+        if spawn_bird.any():
+            rows = np.nonzero(spawn_bird)[0]
+            slot = np.argmin(self.kind[rows] != EMPTY, axis=1)
+            # birds fly in front of the trex head, in front of its legs or at the current trex top
+            place = self.rng.integers(0, 3, len(rows))
+            ys = np.where(place < 2, self.bird_ys[np.minimum(place, 1)], self.trex_y[rows])
+            self.kind[rows, slot] = BIRD
+            self.sprite[rows, slot] = BIRD_SPRITE
+            self.x[rows, slot] = self.screen_width
+            self.left[rows, slot] = self.screen_width
+            self.y[rows, slot] = ys
+            self.damaged[rows, slot] = False
+
+    def _spawn_cacti(self, rows):
+        count = self.rng.choice([1, 2, 3, 4], len(rows), p=[.4 / .8, .2 / .8, .1 / .8, .1 / .8])
+        self.cacti_count[rows] = count
+        # every cactus in a group is unique, so the ids are the first ones of a random permutation
+        ids = np.argsort(self.rng.random((len(rows), CACTUS_IDS)), axis=1)
+        current_x = np.zeros(len(rows), dtype=np.int32)
+        for i in range(4):
+            placing = (count > i) & (self.kind[rows] == EMPTY).any(axis=1)
+            if not placing.any():
+                break
+            group = rows[placing]
+            sprite = ids[placing, i]
+            width = self.sprite_width[sprite]
+            slot = np.argmin(self.kind[group] != EMPTY, axis=1)
+            # the first cactus enters at the screen right and the following ones are attached to its right
+            x = np.where(i == 0, self.screen_width - width // 2, current_x[placing])
+            self.kind[group, slot] = CACTUS
+            self.sprite[group, slot] = sprite
+            self.x[group, slot] = x
+            self.left[group, slot] = x
+            self.y[group, slot] = self.cactus_y[sprite]
+            self.damaged[group, slot] = False
+            current_x[placing] = x + width
+
+    def _move(self, running):
+        """Scrolling the obstacles and bullets and dropping the ones which left the screen"""
+        cacti = (self.kind == CACTUS) & running[:, None]
+        birds = (self.kind == BIRD) & running[:, None]
+        self.left -= np.where(cacti, self.ground_velocity[:, None], 0) + np.where(birds, self.bird_velocity[:, None], 0)
+        self.x = np.where(cacti | birds, _round(self.left), self.x)
+        right = self.x + self.sprite_width[self.sprite]
+        self.kind[cacti & (right <= 0)] = EMPTY
+        self.kind[birds & (right < 0)] = EMPTY
+
+        moving = self.bullet_active & running[:, None]
+        self.bullet_left += np.where(moving, self.settings.per_tick(self.settings.bullet_speed), 0)
+        # Bullet.update sets the rect center to its left and top
+        self.bullet_x = np.where(moving, _round(self.bullet_left) - self.settings.bullet_width // 2, self.bullet_x)
+        self.bullet_y = np.where(moving, _round(self.bullet_top) - self.settings.bullet_height // 2, self.bullet_y)
+        self.bullet_active &= ~(moving & (self.bullet_x > self.screen_width))
@@ -0,0 +1,263 @@
+"""Deterministic benchmarks of the headless engine
+
+Each scenario plays seeded, scripted frames and reports the frames per second, the memory allocated per frame and the
+blocks it leaves alive, the cost of each collision check and the sprites built outside of the pools. The results are
+compared against benchmark_baseline.json:
+
+    python benchmark.py                     # run every scenario and compare against the baseline
+    python benchmark.py --update-baseline   # store the results as the new baseline
+    python benchmark.py --startup           # time to the first frame of the game, with the atlas and with pngs
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from engine import CROUCH, JUMP, NOOP, SHOOT, TRexEngine
+from policies import jumper
+
+BASELINE_FILE = "benchmark_baseline.json"
+
+
+def _invincible(engine):
+    """Keeping the trex alive, so a scenario keeps its load instead of restarting after every crash"""
+    engine.trex.collide = lambda: None
+
+
+def _long_run(engine):
+    pass
+
+
+def _bullet_spam(engine):
+    _invincible(engine)
+    engine.settings.bullet_count = 8
+
+
+def _birds(engine):
+    _invincible(engine)
+    # birds only show up after 450 deciseconds, so the game is started 46 seconds in the past, without the obstacles
+    # of those 46 seconds
+    engine.start_time -= 46000
+    engine.spawner.skip_to(460)
+
+
+def _spawn_storm(engine):
+    _invincible(engine)
+    # at this speed every obstacle leaves the screen in a few frames, and the timeline spawns one every decisecond or
+    # two, the timeline is only generated once the game runs so it picks up these gaps
+    engine.settings.ground_velocity = 60
+    engine.settings.bird_velocity = 60
+    engine.settings.cacti_gap = engine.settings.bird_gap = (1, 2)
+    engine.settings.min_obstacle_gap = 1
+
+
+def _spam_policy(observation, frame):
+    return SHOOT if observation["bullets"] else NOOP
+
+
+def _jumper_policy(observation, frame):
+    return jumper(observation)
+
+
+def _storm_policy(observation, frame):
+    return (JUMP, NOOP, CROUCH, SHOOT)[frame % 4]
+
+
+# name: (setup, policy, seed)
+SCENARIOS = {
+    # the jumper survives long enough to go through many Settings.increase_difficulty levels
+    "long_run": (_long_run, _jumper_policy, 7),
+    "bullet_spam": (_bullet_spam, _spam_policy, 11),
+    "birds": (_birds, _jumper_policy, 13),
+    "spawn_storm": (_spawn_storm, _storm_policy, 17),
+}
+
+
+def _play(name, frames, on_frame=None, instrument=None):
+    """Plays frames of a scenario from its seed, restarting it whenever the trex dies"""
+    setup, policy, seed = SCENARIOS[name]
+    engine = TRexEngine()
+    engine.start()
+
+    def restart():
+        observation = engine.reset(seed)
+        setup(engine)
+        if instrument is not None:
+            instrument(engine)
+        return observation
+    observation = restart()
+    for frame in range(frames):
+        observation, _, done = engine.step(policy(observation, frame))
+        if on_frame is not None:
+            on_frame()
+        if done:
+            observation = restart()
+    return engine
+
+
+def run_scenario(name, frames):
+    """Returns the measurements of a scenario, each one comes from its own pass so they do not disturb each other"""
+    # frames per second
+    start = time.perf_counter()
+    engine = _play(name, frames)
+    fps = frames / (time.perf_counter() - start)
+
+    # cost of each collision check
+    timings = []
+
+    def time_collisions(engine):
+        check = engine._check_collisions
+
+        def timed_check():
+            check_start = time.perf_counter()
+            check()
+            timings.append(time.perf_counter() - check_start)
+        engine._check_collisions = timed_check
+    _play(name, frames, instrument=time_collisions)
+    collision_us = sum(timings) / max(len(timings), 1) * 1e6
+
+    # memory allocated per frame, traced on a shorter pass as tracing slows everything down
+    # the peak of each frame minus the memory at its start is what the frame allocated, even if it was freed before
+    # the frame ended, and the new blocks are the blocks the frame allocated and left alive, compared line by line
+    # between snapshots so the blocks freed by the frame or by the garbage collector do not cancel them out
+    traced_frames = max(frames // 10, 1)
+    allocated = []
+    blocks = []
+    ignored = [tracemalloc.Filter(False, tracemalloc.__file__)]
+
+    def measure():
+        current, peak = tracemalloc.get_traced_memory()
+        allocated.append(peak - measure.current)
+        snapshot = tracemalloc.take_snapshot().filter_traces(ignored)
+        blocks.append(sum(max(stat.count_diff, 0) for stat in snapshot.compare_to(measure.snapshot, "lineno")))
+        measure.snapshot = snapshot
+        # the snapshots are not part of the frame
+        tracemalloc.reset_peak()
+        measure.current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.start()
+    measure.snapshot = tracemalloc.take_snapshot().filter_traces(ignored)
+    measure.current = tracemalloc.get_traced_memory()[0]
+    _play(name, traced_frames, measure)
+    tracemalloc.stop()
+    # the first frames measure the engine construction, they are left out
+    allocated = allocated[10:] or allocated
+    blocks = blocks[10:] or blocks
+
+    return {
+        "fps": round(fps, 1),
+        "collision_us": round(collision_us, 2),
+        "alloc_kb_per_frame": round(sum(allocated) / len(allocated) / 1024, 3),
+        "new_blocks_per_frame": round(sum(blocks) / len(blocks), 3),
+        "difficulty_level": engine.current_mile_stone // 100,
+        # sprites built because their pool was empty, it stays small however long the scenario runs
+        "pool_misses": sum(stats["misses"] for stats in engine.pool_stats().values()),
+    }
+
+
+# started in a fresh interpreter, it builds the game and prints a line when the first frame is flipped
+_STARTUP_CODE = """
+import sys
+import pygame
+import assets
+assets._registry = assets.AssetRegistry(atlas_path=sys.argv[1] or None)
+
+def flip():
+    print("frame", flush=True)
+    raise SystemExit
+pygame.display.flip = flip
+from trex_game import TRexRunner
+TRexRunner().start_game()
+"""
+
+
+def time_to_first_frame(atlas_path, runs=9):
+    """Returns the median time in seconds from starting main.py-like process to its first frame, the sprites come
+    from the atlas at atlas_path or from the pngs when it is None"""
+    env = dict(os.environ)
+    env.setdefault("SDL_VIDEODRIVER", "dummy")
+    env.setdefault("SDL_AUDIODRIVER", "dummy")
+    env["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, "-c", _STARTUP_CODE, atlas_path or ""], stdout=subprocess.PIPE,
+                                   env=env, text=True)
+        process.stdout.readline()
+        times.append(time.perf_counter() - start)
+        process.wait()
+    return statistics.median(times)
+
+
+def compare(results, baseline, threshold):
+    """Returns the regressions of results against the baseline as readable lines, fps must not drop and the
+    collision cost must not grow by more than the threshold"""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        expected = baseline[name]
+        if result["fps"] < expected["fps"] * (1 - threshold):
+            regressions.append(f"{name}: fps {result['fps']} < baseline {expected['fps']}")
+        if result["collision_us"] > expected["collision_us"] * (1 + threshold):
+            regressions.append(f"{name}: collision {result['collision_us']}us > baseline {expected['collision_us']}us")
+    return regressions
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Deterministic benchmarks of the headless T-Rex engine")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="scenario to run, can be repeated, all of them by default")
+    parser.add_argument("--frames", type=int, default=5000, help="frames played by each scenario")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed relative regression against the baseline, 0.25 is 25%%")
+    parser.add_argument("--update-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--startup", action="store_true",
+                        help="only measure the time to the first frame, with the atlas built by atlas.py and with pngs")
+    args = parser.parse_args(args)
+
+    if args.startup:
+        from atlas import ATLAS_FILE, build
+        build()
+        with_atlas = time_to_first_frame(ATLAS_FILE)
+        with_pngs = time_to_first_frame(None)
+        print(f"time to first frame: {with_atlas * 1000:.0f} ms with the atlas, {with_pngs * 1000:.0f} ms with pngs")
+        # the part of it spent loading the sprites, which is what the atlas changes
+        from assets import AssetRegistry
+        for name, path in (("atlas", ATLAS_FILE), ("pngs", None)):
+            start = time.perf_counter()
+            AssetRegistry(atlas_path=path)
+            print(f"loading the sprites from the {name}: {(time.perf_counter() - start) * 1000:.1f} ms")
+        return 0
+
+    results = {}
+    for name in args.scenario or SCENARIOS:
+        results[name] = run_scenario(name, args.frames)
+        result = results[name]
+        print(f"{name:12} {result['fps']:10.1f} fps {result['collision_us']:8.2f} us/collision check "
+              f"{result['alloc_kb_per_frame']:8.3f} KiB/frame {result['new_blocks_per_frame']:8.3f} new blocks/frame "
+              f"level {result['difficulty_level']} {result['pool_misses']} pool misses")
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+            file.write("\n")
+        return 0
+    try:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    except FileNotFoundError:
+        print(f"no baseline at {args.baseline}, run with --update-baseline to create it")
+        return 0
+    regressions = compare(results, baseline, args.threshold)
+    for regression in regressions:
+        print("REGRESSION", regression)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+import weakref
+
+import pygame
+
+
+class ScaledCanvas:
+    """Off-screen surface the world is drawn on at scale times the window size, it is upscaled to the window once per
+    frame by present
+
+    It takes the fill, blit and blits calls of a Surface in the logical coordinates of the window, so the sprites and
+    the simulation never know about the scale. Every image of the asset registry is scaled once when the canvas is
+    built, the other images, like the bullet surface, the tiled ground or the strips of the parallax layers, the first
+    time they are drawn and forgotten with them"""
+
+    def __init__(self, window, scale, assets):
+        self.window = window
+        self.scale = scale
+        width, height = window.get_size()
+        self.surface = pygame.Surface((round(width * scale), round(height * scale)), 0, window)
+        self.images = weakref.WeakKeyDictionary()
+        for image in assets.images.values():
+            self._scaled(image)
+
+    def _scaled(self, image):
+        width, height = image.get_size()
+        size = (max(round(width * self.scale), 1), max(round(height * self.scale), 1))
+        scaled = self.images[image] = pygame.transform.smoothscale(image, size)
+        if image.get_flags() & pygame.RLEACCELOK:
+            scaled.set_alpha(255, pygame.RLEACCEL)
+        return scaled
+
+    def fill(self, color):
+        self.surface.fill(color)
+
+    def blit(self, image, position):
+        scaled = self.images.get(image)
+        if scaled is None:
+            scaled = self._scaled(image)
+        scale = self.scale
+        self.surface.blit(scaled, (position[0] * scale, position[1] * scale))
+
+    def blits(self, sequence, doreturn=True):
+        images = self.images
+        scale = self.scale
+        sequence = [(images.get(image) or self._scaled(image), (x * scale, y * scale)) for image, (x, y) in sequence]
+        return self.surface.blits(sequence, doreturn)
+
+    def present(self):
+        """Upscaling the drawn world to the window"""
+        pygame.transform.scale(self.surface, self.window.get_size(), self.window)
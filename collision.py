@@ -0,0 +1,153 @@
+import math
+from bisect import bisect_left
+
+import pygame
+
+# only the end positions are tested when nothing moves
+STILL = (0, 0)
+
+
+def _left(sprite):
+    return sprite.rect.left
+
+
+def mask_hit(sprite, other, offset):
+    """Returns whether the masks of the sprites overlap with other at offset from sprite, like
+    pygame.sprite.collide_mask at the offset of their rects"""
+    return sprite.mask.overlap(other.mask, offset) is not None
+
+
+def thinnest(*sizes):
+    """Returns the smallest width and the smallest height of the (width, height) sizes"""
+    return min(size[0] for size in sizes), min(size[1] for size in sizes)
+
+
+def is_swept(motion, size):
+    """Returns whether sprites moving by motion relative to each other can pass through each other between two
+    checks, size is the thinnest width and height of the sprites, see thinnest, and a motion no larger than it on both
+    axes is only tested at the end positions like a single frame always was"""
+    return abs(motion[0]) > size[0] or abs(motion[1]) > size[1]
+
+
+def swept_rect(rect, motion):
+    """Returns the area other rects moving by motion during a frame have to cross to touch rect"""
+    dx = round(motion[0])
+    dy = round(motion[1])
+    # a pixel more on each side for the rounding of the positions in between
+    return pygame.Rect(rect.left + min(dx, 0) - 1, rect.top + min(dy, 0) - 1, rect.width + abs(dx) + 2,
+                       rect.height + abs(dy) + 2)
+
+
+def impact_times(rect, other, motion, size):
+    """Returns the times of the frame, 0 at the previous check and 1 now, at which other has to be mask tested
+    against rect, other having moved by motion relative to rect during the frame
+
+    The times other enters and leaves rect are computed on each axis and the times in between are sampled at most
+    the thinnest width and height, size, apart from the time of impact, the end position included if it is in
+    between, so a collision is never skipped however fast the sprites move"""
+    dx, dy = motion
+    enter = 0.0
+    leave = 1.0
+    for low, high, position, delta in ((rect.left - other.width, rect.right, other.left, dx),
+                                       (rect.top - other.height, rect.bottom, other.top, dy)):
+        if delta == 0:
+            if not low < position < high:
+                return ()
+            continue
+        # other was at position - delta at time 0 and is at position now
+        first = 1 + (low - position) / delta
+        last = 1 + (high - position) / delta
+        if first > last:
+            first, last = last, first
+        enter = max(enter, first)
+        leave = min(leave, last)
+        if enter >= leave:
+            return ()
+    count = math.ceil((leave - enter) * max(abs(dx) / size[0], abs(dy) / size[1]))
+    return [enter + (leave - enter) * i / count for i in range(1, count + 1)]
+
+
+def _end_hit(sprite, other, collided):
+    rect = sprite.rect
+    other_rect = other.rect
+    return collided(sprite, other, (other_rect.left - rect.left, other_rect.top - rect.top))
+
+
+def _swept_hit(sprite, other, motion, size, collided):
+    rect = sprite.rect
+    other_rect = other.rect
+    for time in impact_times(rect, other_rect, motion, size):
+        back = time - 1
+        offset = (round(other_rect.left + motion[0] * back) - rect.left,
+                  round(other_rect.top + motion[1] * back) - rect.top)
+        if collided(sprite, other, offset):
+            return True
+    return False
+
+
+def spritecollide(sprite, group, dokill, collided=mask_hit, motion=STILL, size=(1, 1)):
+    """Same as pygame.sprite.spritecollide, but only the sprites whose rect crosses the sprite rect reach the
+    collided test, the rect test of the whole group is a single collidelistall call
+
+    motion is how far every sprite of the group moved relative to sprite since the previous check, if it is larger than
+    size, the thinnest width and height of the sprites, the crossing sprites are tested along their way, see
+    impact_times, collided takes the two sprites and the offset of the second one"""
+    sprites = group.sprites()
+    if not sprites:
+        return []
+    rects = [other.rect for other in sprites]
+    if is_swept(motion, size):
+        candidates = swept_rect(sprite.rect, motion).collidelistall(rects)
+        crashed = [sprites[i] for i in candidates if _swept_hit(sprite, sprites[i], motion, size, collided)]
+    else:
+        candidates = sprite.rect.collidelistall(rects)
+        crashed = [sprites[i] for i in candidates if _end_hit(sprite, sprites[i], collided)]
+    if dokill:
+        for other in crashed:
+            other.kill()
+    return crashed
+
+
+def groupcollide(group_a, group_b, dokill_a, dokill_b, collided=mask_hit, motion=STILL, size=(1, 1)):
+    """Same as pygame.sprite.groupcollide, but the pairs are found with a sorted x-interval sweep and only the pairs
+    whose rects cross reach the collided test, motion is how far the sprites of group_b moved relative to the ones of
+    group_a, see spritecollide"""
+    crashed = {}
+    sprites_b = sorted(group_b.sprites(), key=_left)
+    if not sprites_b:
+        return crashed
+    order = {sprite: i for i, sprite in enumerate(group_b.sprites())}
+    lefts = [sprite.rect.left for sprite in sprites_b]
+    max_width = max(sprite.rect.width for sprite in sprites_b)
+    swept = is_swept(motion, size)
+    # how much further left and right than a rect the swept area of the rect reaches, see swept_rect
+    reach_left = reach_right = 0
+    if swept:
+        reach_left = min(round(motion[0]), 0) - 1
+        reach_right = max(round(motion[0]), 0) + 1
+    for sprite in group_a.sprites():
+        rect = sprite.rect
+        # only the sprites starting between rect.left - max_width and rect.right can overlap rect on x
+        start = bisect_left(lefts, rect.left + reach_left - max_width)
+        end = bisect_left(lefts, rect.right + reach_right)
+        if start == end:
+            continue
+        if swept:
+            rect = swept_rect(rect, motion)
+            hits = [other for other in sprites_b[start:end]
+                    if rect.colliderect(other.rect) and other.alive() and _swept_hit(sprite, other, motion, size,
+                                                                                      collided)]
+        else:
+            hits = [other for other in sprites_b[start:end]
+                    if rect.colliderect(other.rect) and other.alive() and _end_hit(sprite, other, collided)]
+        if not hits:
+            continue
+        # keeping the group order of pygame.sprite.groupcollide
+        hits.sort(key=order.__getitem__)
+        crashed[sprite] = hits
+        if dokill_a:
+            sprite.kill()
+        if dokill_b:
+            for other in hits:
+                other.kill()
+    return crashed
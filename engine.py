@@ -0,0 +1,596 @@
+from collections import namedtuple
+
+import pygame
+
+import collision
+from assets import get_assets
+from entities import EntityStore, ScrollingGround
+from pool import SpritePool
+from profiler import NullProfiler
+from settings import Settings
+from spawns import SpawnScheduler
+from telemetry import NullTelemetry
+from trex_game_sprites import *
+
+# actions accepted by TRexEngine.step
+NOOP = 0
+JUMP = 1
+CROUCH = 2
+SHOOT = 3
+ACTIONS = (NOOP, JUMP, CROUCH, SHOOT)
+
+# the whole state of a game as plain values returned by TRexEngine.snapshot, the sprites are tuples of their
+# get_state values in the order of their group and difficulty holds the nonstatic settings
+GameState = namedtuple("GameState", "started start_time ticks current_time_int_deci score addition kills "
+                                    "cause_of_death current_mile_stone should_not_play_sound milestone_reached "
+                                    "difficulty random spawns trex ground clouds cacti stars birds moons bullets")
+
+
+class SimulatedClock:
+    """Clock used in place of pygame.time when the game runs headless, time only moves when it is advanced"""
+
+    def __init__(self, frame_time=1000 / 60):
+        # the interactive game ticks at 60 frames per second, so a simulated frame lasts 1000 / 60 millis by default
+        self.frame_time = frame_time
+        self.ticks = 0.0
+
+    def get_ticks(self):
+        """Returns the simulated time in millis, same as pygame.time.get_ticks"""
+        return int(self.ticks)
+
+    def advance(self, millis=None):
+        """Moving the simulated time forward by one frame or by the given millis"""
+        self.ticks += self.frame_time if millis is None else millis
+
+
+class FrameClock:
+    """Clock sampling pygame.time once per drawn frame, the front end turns the sampled real time into fixed ticks of
+    a SimulatedClock"""
+
+    def __init__(self):
+        self.ticks = pygame.time.get_ticks()
+
+    def sample(self):
+        """Sampling the real time at the beginning of a frame"""
+        self.ticks = pygame.time.get_ticks()
+        return self.ticks
+
+    def get_ticks(self):
+        return self.ticks
+
+
+class Sounds:
+    """Loads the game sounds and plays them by their file name"""
+
+    def __init__(self):
+        self.sounds = {}
+        for name in ("start_or_jump", "crash", "milestone", "shoot", "shot_hit_1", "shot_hit_2"):
+            self.sounds[name] = pygame.mixer.Sound(f"assets/sounds/{name}.wav")
+
+    def play(self, name):
+        self.sounds[name].play()
+
+
+class NullSounds:
+    """Sound player used when there is no mixer, it plays nothing"""
+
+    def play(self, name):
+        pass
+
+
+class TRexEngine:
+    """T-Rex game simulation, it owns the sprites and the game rules but never opens a window or plays sounds by
+    itself, so it can run headless as fast as the CPU allows"""
+
+    def __init__(self, screen=None, clock=None, sounds=None, settings=None):
+        """Initializing the engine, every dependency is optional so TRexEngine() is a ready to use headless game"""
+        self.settings = Settings() if settings is None else settings
+        # sprites only use the screen to know its size, so a headless engine places them on an off-screen surface
+        self.screen = pygame.Surface(self.settings.screen_dimen) if screen is None else screen
+        self.screen_rect = self.screen.get_rect()
+        self.clock = SimulatedClock(1000 / self.settings.tick_rate) if clock is None else clock
+        # an engine running on its own simulated clock restarts it on every reset, so a seeded game never depends on
+        # the time left by the previous one
+        self.owns_clock = clock is None
+        self.sounds = NullSounds() if sounds is None else sounds
+        self.assets = get_assets()
+        # the front end replaces it with a FrameProfiler when the frame timing instrumentation is enabled
+        self.profiler = NullProfiler()
+        # and with a SessionTelemetry when the telemetry is enabled
+        self.telemetry = NullTelemetry()
+        # addition variable is used to add to the current score
+        # addition is increased by 4 when player kills a cactus,
+        # and it is increased by 8 when player kills a bird
+        self.addition = 0
+        # counting the killed obstacles and recording what the trex collided with, for bots and evaluations
+        self.kills = 0
+        self.cause_of_death = None
+        # monitoring game status, at first it is not started unless a player presses any key
+        self.started = False
+        self.start_time = 0
+        self.current_time_int_deci = 0
+        # scoring
+        self.score = 0
+        self.current_mile_stone = 0
+        self.should_not_play_sound = False
+        self.milestone_reached = False
+        # the cacti, birds, stars and moons come from a timeline seeded by the game random generator
+        self.spawner = SpawnScheduler(self.settings)
+        self.spawner.reset(self.settings.random.getrandbits(64))
+        # killed sprites are kept in pools and reused, so steady play does not build new sprites or surfaces
+        self.pools = {
+            "cactus": SpritePool(Cactus, 16),
+            "bird": SpritePool(Bird, 4),
+            "bullet": SpritePool(Bullet, 16),
+        }
+        # init sprites
+
+        # ground
+        self._init_ground()
+        # t-rex
+        self._init_trex()
+        # clouds
+        self._init_clouds()
+        # cacti
+        self._init_cacti()
+        # star
+        self._init_stars()
+        # bird
+        self._init_birds()
+        # moon
+        self._init_moon()
+        # bullets
+        self._init_bullet()
+        # sizes below which the collision checks do not sweep the sprites
+        self._init_collision_sizes()
+
+    def reset(self, seed=None):
+        """Resets the game to its initial state, seeding the random generator if a seed is given, and returns the
+        first observation"""
+        if seed is not None:
+            self.settings.random.seed(seed)
+        if self.owns_clock:
+            self.clock.ticks = 0.0
+        self.start_time = self.clock.get_ticks()
+        self.current_time_int_deci = 0
+        self.addition = 0
+        self.kills = 0
+        self.cause_of_death = None
+        self.score = 0
+        self.current_mile_stone = 0
+        self.should_not_play_sound = False
+        self.milestone_reached = False
+        self.spawner.reset(self.settings.random.getrandbits(64))
+        self._drop_sprites()
+        # the ground and the clouds start over as well, so a seeded game never depends on the previous one
+        self.ground.reset()
+        self._create_clouds()
+        self.trex.reset()
+        self.settings.reset_difficulty()
+        return self.observation()
+
+    def step(self, action=NOOP):
+        """Plays one action and advances the game by one frame of the simulated clock, returns a tuple of
+        (observation, reward, done) where the reward is the score gained during the frame"""
+        if not self.started:
+            self.start()
+        if action == JUMP:
+            self.jump()
+        elif action == CROUCH:
+            self.crouch()
+        else:
+            # crouching only lasts as long as the crouch action is held
+            self.stand()
+        if action == SHOOT:
+            self.fire_bullet()
+        score = self.score
+        self.clock.advance()
+        self.update()
+        return self.observation(), self.score - score, self.trex.collided
+
+    def snapshot(self):
+        """Returns the whole state of the game as a GameState, it holds no surface and can be copied, pickled and
+        given back to restore any number of times, for example to search the future actions from the same frame"""
+        settings = self.settings
+        return GameState(
+            self.started, self.start_time, self.clock.ticks, self.current_time_int_deci, self.score, self.addition,
+            self.kills, self.cause_of_death, self.current_mile_stone, self.should_not_play_sound,
+            self.milestone_reached,
+            (settings.cloud_velocity, settings.ground_velocity, settings.star_velocity, settings.moon_velocity,
+             settings.bird_velocity, settings.bullet_count),
+            settings.random.getstate(),
+            self.spawner.get_state(),
+            self.trex.get_state(),
+            self.ground.get_state(),
+            self.clouds.get_state(),
+            tuple([sprite.get_state() for sprite in self.cactus_group]),
+            self.stars.get_state(),
+            tuple([sprite.get_state() for sprite in self.bird_group]),
+            self.moons.get_state(),
+            tuple([sprite.get_state() for sprite in self.bullet_group]),
+        )
+
+    def restore(self, state):
+        """Puts the game back in a state returned by snapshot"""
+        settings = self.settings
+        (self.started, self.start_time, self.clock.ticks, self.current_time_int_deci, self.score, self.addition,
+         self.kills, self.cause_of_death, self.current_mile_stone, self.should_not_play_sound,
+         self.milestone_reached) = state[:11]
+        (settings.cloud_velocity, settings.ground_velocity, settings.star_velocity, settings.moon_velocity,
+         settings.bird_velocity, settings.bullet_count) = state.difficulty
+        self.spawner.set_state(state.spawns)
+        self.trex.set_state(state.trex)
+        self.ground.set_state(state.ground)
+        self.clouds.set_state(state.clouds)
+        self._restore_group(self.cactus_group, "cactus", state.cacti)
+        self.stars.set_state(state.stars)
+        self._restore_group(self.bird_group, "bird", state.birds)
+        self.moons.set_state(state.moons)
+        self._restore_group(self.bullet_group, "bullet", state.bullets)
+        # last, building a sprite which was not in a pool may have used the random generator
+        settings.random.setstate(state.random)
+
+    def _restore_group(self, group, pool, states):
+        """Reusing the sprites already in the group and only taking the missing ones from the pool, so restoring a
+        state close to the current one is cheap"""
+        sprites = group.sprites()
+        for sprite, sprite_state in zip(sprites, states):
+            sprite.set_state(sprite_state)
+        for sprite in sprites[len(states):]:
+            sprite.kill()
+        for sprite_state in states[len(sprites):]:
+            group.add(self.pools[pool].acquire_state(self, sprite_state))
+
+    def observation(self):
+        """Returns a compact description of the world: the trex state, the game speed and the obstacles sorted by x"""
+        obstacles = [("cactus", c.rect.x, c.rect.y, c.rect.width, c.rect.height) for c in self.cactus_group]
+        obstacles += [("bird", b.rect.x, b.rect.y, b.rect.width, b.rect.height) for b in self.bird_group]
+        obstacles.sort(key=lambda obstacle: obstacle[1])
+        return {
+            "trex_y": self.trex.rect.y,
+            "jumping": self.trex.jumping,
+            "crouching": self.trex.crouching,
+            "ground_velocity": self.settings.ground_velocity,
+            "bird_velocity": self.settings.bird_velocity,
+            "bullets": self.get_bullet_count(),
+            "score": self.score,
+            "obstacles": obstacles,
+        }
+
+    def render(self):
+        """Drawing the world on the engine screen, a headless engine only draws when asked to"""
+        screen = self.screen
+        screen.fill(self.settings.screen_background_color)
+        self.ground.draw(screen)
+        self.moons.draw(screen)
+        self.stars.draw(screen)
+        self.clouds.draw(screen)
+        for group in (self.cactus_group, self.bird_group, self.bullet_group, self.trex_group):
+            group.draw(screen)
+
+    def handle_input(self, event_type, key=0):
+        """Applies a KEYDOWN, KEYUP or MOUSEBUTTONDOWN input of the player, for a mouse button the key is 1 when the
+        play again button was clicked"""
+        if event_type == pygame.KEYDOWN:
+            if not self.started:
+                self.start()
+            if key == pygame.K_UP:
+                self.jump()
+            elif key == pygame.K_DOWN:
+                self.crouch()
+            if key == pygame.K_SPACE:
+                self.fire_bullet()
+        elif event_type == pygame.KEYUP:
+            self.stand()
+        elif event_type == pygame.MOUSEBUTTONDOWN and key and self.trex.collided:
+            self.restart()
+
+    def restart(self):
+        """Plays again after a game over"""
+        self.sounds.play("start_or_jump")
+        self.reset()
+
+    def start(self):
+        """Starts the game"""
+        # resetting time to current time when the user first start the game, so we start at 0 deciseoncds
+        self.start_time = self.clock.get_ticks()
+        self.sounds.play("start_or_jump")
+        self.started = True
+
+    def jump(self):
+        if not self.trex.jumping:
+            self.sounds.play("start_or_jump")
+        self.trex.jumping = True
+        self.trex.crouching = False
+
+    def crouch(self):
+        self.trex.jumping = False
+        self.trex.crouching = True
+
+    def stand(self):
+        self.trex.crouching = False
+
+    def fire_bullet(self):
+        """Creates and shoots bullets only if the game is not over and if we have enough space for more bullets"""
+        if self.settings.bullet_count > len(self.bullet_group) and not self.trex.collided:
+            bullet = self.pools["bullet"].acquire(self)
+            self.bullet_group.add(bullet)
+            self.telemetry.fired()
+            self.sounds.play("shoot")
+
+    def get_bullet_count(self):
+        """Returns bullet count"""
+        return abs(len(self.bullet_group) - self.settings.bullet_count)
+
+    def _init_trex(self):
+        """Initializing the trex and placing it accordingly on top of the ground"""
+        self.trex_group = pygame.sprite.Group()
+        sprites_y = self.ground.floor_y - self.ground.height
+        self.trex = TRex(self, sprites_y)
+        self.trex_group.add(self.trex)
+
+    def _init_ground(self):
+        """Initializing the ground at y = 75% of screen height, it is only drawn and scrolls forever"""
+        self.ground = ScrollingGround(self.assets.image("ground/ground"), self.screen_rect)
+
+    def _init_clouds(self):
+        """Initializing the clouds randomly and placing them between the tops of the clouds and the ground
+        We are passing 250 * i value as x coordinate to each cloud just to have a void between them
+        The clouds, the stars and the moon are only drawn, they live in entity stores instead of sprite groups"""
+        self.clouds = EntityStore([self.assets.image("cloud/cloud")], cull_right=1)
+        self._create_clouds()
+
+    def _create_clouds(self):
+        """Creating the first clouds of a game, the stores are kept for the whole session so the front end can hold on
+        to them"""
+        for i in range(1, 4):
+            self._create_cloud(i * 250)
+
+    def _init_cacti(self):
+        """Initializing cacti group"""
+        self.cactus_group = pygame.sprite.Group()
+
+    def _init_stars(self):
+        """Initializing stars store, the kind of a star is its image number minus 1"""
+        self.stars = EntityStore([self.assets.image(f"star/star-{i}") for i in range(1, 4)], centered=True)
+
+    def _init_birds(self):
+        """Initializing birds group"""
+        self.bird_group = pygame.sprite.Group()
+
+    def _init_moon(self):
+        """Initializing moon store, the kind of a moon is its image number"""
+        self.moons = EntityStore([self.assets.image(f"moon/moon-{i}") for i in range(7)], centered=True)
+
+    def _init_bullet(self):
+        """Initializing bullet group"""
+        self.bullet_group = pygame.sprite.Group()
+
+    def _init_collision_sizes(self):
+        """Finding the thinnest width and height of the sprites of each pair of groups checked for collisions, sprites
+        moving no further than that relative to each other cannot pass through each other between two checks"""
+        cactus = collision.thinnest(*[self.assets.mask(name).get_size() for name in self.assets.images
+                                      if name.startswith("cactus/") and not name.endswith("-shot")])
+        # every bird is tested with the mask of its first image, like the trex
+        bird = self.assets.mask("bird/bird-1").get_size()
+        trex = self.trex.mask.get_size()
+        bullet = (self.settings.bullet_width, self.settings.bullet_height)
+        self.collision_sizes = {
+            "trex_cactus": collision.thinnest(trex, cactus),
+            "trex_bird": collision.thinnest(trex, bird),
+            "bullet_cactus": collision.thinnest(bullet, cactus),
+            "bullet_bird": collision.thinnest(bullet, bird),
+        }
+
+    def update(self):
+        """Updating sprites and most game elements by one frame, nothing moves before the game is started or after
+        the trex collided"""
+        if not self.started or self.trex.collided:
+            return
+        # getting current time in millis to show/update some sprites
+        current_time = self.clock.get_ticks()
+        # converting current time to deciseoncds
+        self.current_time_int_deci = int((current_time - self.start_time) * 0.01)
+        # updating score
+        self._update_score(self.current_time_int_deci + self.addition)
+
+        # update trex
+        self.trex.update()
+        self.profiler.mark("update")
+        self._check_collisions()
+        self.profiler.mark("collisions")
+
+        # update ground
+        self.ground.update(self.settings.ground_velocity)
+
+        # update clouds
+        self.clouds.update(self.settings.cloud_velocity)
+        if len(self.clouds) < 3:
+            self._create_cloud()
+
+        # update star
+        self.stars.update(self.settings.star_velocity)
+        # spawning whatever the timeline holds for this decisecond, most frames nothing is due
+        for event in self.spawner.due(self.current_time_int_deci):
+            self._spawn(event)
+
+        # update Cacti
+        for cactus in self.cactus_group.sprites():
+            cactus.update()
+        # update birds
+        for bird in self.bird_group.sprites():
+            bird.update()
+
+        # update moon
+        self.moons.update(self.settings.moon_velocity)
+
+        # update bullets
+        for bullet in self.bullet_group.sprites():
+            bullet.update()
+        self.profiler.mark("update")
+
+    def _update_score(self, deci):
+        """Updating the score and increasing the difficulty on every milestone"""
+        # checking if we passed 100 points
+        if deci >= 100 and (deci % 100 == 0 or (deci - self.current_mile_stone) >= 100):
+            self.current_mile_stone = deci
+            if not self.should_not_play_sound:
+                # if we don't have this if condition then the following block will run multiple times
+                self.sounds.play("milestone")
+                self.should_not_play_sound = True
+                self.settings.increase_difficulty()
+        else:
+            self.should_not_play_sound = False
+        # the score is highlighted for the first 10 deciseconds after passing a milestone
+        self.milestone_reached = deci > 100 and self.current_mile_stone <= deci < self.current_mile_stone + 10
+        self.score = deci
+
+    def _create_cloud(self, x=0):
+        """Creating clouds randomly between 40% and 65% of the screen height"""
+        image = self.clouds.images[0]
+        x = self.screen_rect.width + image.get_width() + x
+        y = self.settings.random.randrange(self.screen_rect.height * .40, self.screen_rect.height * .65)
+        self.clouds.add(0, x - image.get_width() // 2, y - image.get_height() // 2)
+
+    def _spawn(self, event):
+        """Creating the sprites of a SpawnEvent"""
+        self.telemetry.spawned(event)
+        if event.kind == "cacti":
+            self._create_cacti(event.params)
+        elif event.kind == "bird":
+            self._create_bird(event.params)
+        elif event.kind == "stars":
+            for i, (kind, y) in enumerate(event.params):
+                # same as clouds we are passing 250 * i value as x coordinate to each star just to have a void
+                # between them
+                self._create_star(i * 250, kind, y)
+        else:
+            self._create_moon(event.params)
+
+    def upcoming_obstacles(self, window=30):
+        """Returns the SpawnEvents of the cacti and birds due within the next window deciseconds, they are not on the
+        screen yet, for bots planning ahead and for tests"""
+        return self.spawner.lookahead(self.current_time_int_deci, window)
+
+    def _create_star(self, x, kind, y):
+        """Creating a star between 45% and 60% of the screen height"""
+        x = self.screen_rect.width + self.stars.images[kind].get_width() + x
+        self.stars.add(kind, x, y)
+
+    def _create_moon(self, phase):
+        """Creating a moon phase"""
+        self.moons.add(phase, self.screen_rect.width, self.screen_rect.height * .45)
+
+    def _create_bird(self, lane):
+        """Creating a bird in one of 3 places ( in front of trex head, in front of trex leg, overhead the trex)"""
+        top_of_bird = self.ground.floor_y - self.trex.rect.height - self.ground.height * 0.75
+        bottom_of_ground = self.ground.floor_y + self.ground.height
+        top_of_trex = self.trex.rect.top
+        list_of_ys = [top_of_bird, bottom_of_ground, top_of_trex]
+        self.bird_group.add(self.pools["bird"].acquire(self, list_of_ys, lane))
+
+    def _create_cacti(self, ids):
+        """Creating a group of cacti, the timeline picks unique ids for the cacti of a group"""
+        # calculating the previous cactus width and x to increase the x pos of the following cactus
+        prev_x = 0
+        prev_width = 0
+        for cactus_id in ids:
+            # calculating the cactus y to place it on the ground
+            cactus_y = self.ground.floor_y + self.ground.height / 2
+            # calculating the cactus x just space them in a group as explained in Cactus class
+            cactus_x = prev_x + prev_width
+            cactus = self.pools["cactus"].acquire(self, cactus_y, cactus_x, cactus_id)
+            prev_x = cactus.rect.x
+            prev_width = cactus.rect.width
+            self.cactus_group.add(cactus)
+
+    def _check_collisions(self):
+        """Checking collisions between bullets and birds or cacti as well as trex collision with birds or cacti
+        The collision module first filters the pairs whose rects overlap, only those reach the mask test
+        The trex moved during this tick and the other sprites during the previous one, after the last check, the
+        collision module sweeps them back along these motions when they are larger than the thinnest of the sprites, see
+        _init_collision_sizes, so fast sprites cannot pass through each other"""
+        settings = self.settings
+        sizes = self.collision_sizes
+        bullet_speed = settings.per_tick(settings.bullet_speed)
+        # how far the obstacles moved relative to the trex and to the bullets since the last check
+        trex_dy = self.trex.dy
+        cactus_motion = (-settings.ground_velocity, -trex_dy)
+        bird_motion = (-settings.bird_velocity, -trex_dy)
+        # trex collisions
+        cactus_hits_trex = collision.spritecollide(
+            self.trex,
+            self.cactus_group,
+            True,
+            self.telemetry.collided,
+            cactus_motion,
+            sizes["trex_cactus"])
+        bird_hits_trex = collision.spritecollide(
+            self.trex,
+            self.bird_group,
+            True,
+            self.telemetry.collided,
+            bird_motion,
+            sizes["trex_bird"])
+
+        if bird_hits_trex or cactus_hits_trex:
+            self.cause_of_death = "bird" if bird_hits_trex else "cactus"
+            self.sounds.play("crash")
+            self.trex.collide()
+        # bullet collisions
+
+        # on first bullet bird/cactus collision the image of the sprite are set to damaged sprites
+        # and the second bullet kills the sprite gives the player points accordingly
+        bullet_hit_bird = collision.groupcollide(
+            self.bullet_group,
+            self.bird_group,
+            True,
+            False,
+            self.telemetry.collided,
+            (-settings.bird_velocity - bullet_speed, 0),
+            sizes["bullet_bird"])
+
+        for bullet in bullet_hit_bird:
+            for bird in bullet_hit_bird[bullet]:
+                self.telemetry.bullet_hit()
+                if bird.current_list == bird.damaged_bird_sprites:
+                    bird.kill()
+                    self.addition += 8
+                    self.kills += 1
+                    self.sounds.play("shot_hit_2")
+                    return
+                bird.set_damaged()
+                self.sounds.play("shot_hit_1")
+
+        bullet_hit_cactus = collision.groupcollide(
+            self.bullet_group,
+            self.cactus_group,
+            True,
+            False,
+            self.telemetry.collided,
+            (-settings.ground_velocity - bullet_speed, 0),
+            sizes["bullet_cactus"])
+        for bullet in bullet_hit_cactus:
+            for cactus in bullet_hit_cactus[bullet]:
+                self.telemetry.bullet_hit()
+                if cactus.image == cactus.damaged_image:
+                    cactus.kill()
+                    self.addition += 4
+                    self.kills += 1
+                    self.sounds.play("shot_hit_2")
+                    return
+                cactus.set_damaged()
+                self.sounds.play("shot_hit_1")
+
+    def pool_stats(self):
+        """Returns the hits, misses and free sprites of each pool"""
+        return {name: pool.stats() for name, pool in self.pools.items()}
+
+    def _drop_sprites(self):
+        """Drops sprites, killing them one by one so they go back to their pools"""
+        for group in (self.cactus_group, self.bird_group, self.bullet_group):
+            for sprite in group.sprites():
+                sprite.kill()
+        self.clouds.clear()
+        self.stars.clear()
+        self.moons.clear()
@@ -0,0 +1,192 @@
+from array import array
+
+import pygame
+
+
+def _round(value):
+    """Rounding half away from zero, the way pygame.Rect stores float coordinates"""
+    return int(value + 0.5) if value >= 0 else -int(0.5 - value)
+
+
+class EntityStore:
+    """Entities of one kind kept as parallel typed arrays instead of one Sprite each, they are moved, culled and drawn
+    in bulk
+
+    x and y are the top left of each entity, rounded to the pixel after every move like a Rect, or its float center
+    when centered is True, for the entities which move by fractions of a pixel. kind is the index of the entity
+    image. An entity costs a few dozen bytes instead of a Sprite with its own rect and attribute dict"""
+
+    # the parallel arrays, one value per entity
+    _COLUMNS = ("kind", "x", "y", "left", "top", "offset", "width")
+    __slots__ = ("images", "centered", "cull_right", "version") + _COLUMNS
+
+    def __init__(self, images, centered=False, cull_right=0):
+        self.images = images
+        self.centered = centered
+        # an entity is dropped once its right edge is left of cull_right
+        self.cull_right = cull_right
+        # changes whenever an entity is added or dropped, see ParallaxLayer
+        self.version = 0
+        self.kind = array("B")
+        self.x = array("d")
+        self.y = array("d")
+        # the drawn left edge follows x, the drawn top, the offset of the left edge from the rounded x and the width
+        # are set when an entity is added
+        self.left = array("i")
+        self.top = array("i")
+        self.offset = array("i")
+        self.width = array("i")
+
+    def __len__(self):
+        return len(self.kind)
+
+    def add(self, kind, x, y):
+        width, height = self.images[kind].get_size()
+        self.version += 1
+        self.kind.append(kind)
+        self.x.append(x)
+        self.y.append(y)
+        if self.centered:
+            offset = -(width // 2)
+            self.left.append(_round(x) + offset)
+            self.top.append(_round(y) - height // 2)
+        else:
+            offset = 0
+            self.left.append(int(x))
+            self.top.append(int(y))
+        self.offset.append(offset)
+        self.width.append(width)
+
+    def clear(self):
+        self.version += 1
+        for name in self._COLUMNS:
+            del getattr(self, name)[:]
+
+    def update(self, velocity):
+        """Moving every entity left by velocity and dropping the ones which left the screen"""
+        x = self.x
+        lefts = self.left
+        width = self.width
+        cull_right = self.cull_right
+        offset = self.offset
+        leaving = False
+        # x keeps the fractions of a pixel, only the drawn left edge is rounded
+        for i in range(len(x)):
+            x[i] -= velocity
+            lefts[i] = left = _round(x[i]) + offset[i]
+            if left + width[i] < cull_right:
+                leaving = True
+        if leaving:
+            self._cull()
+
+    def _cull(self):
+        kept = [i for i in range(len(self.x)) if self.left[i] + self.width[i] >= self.cull_right]
+        self.version += 1
+        for name in self._COLUMNS:
+            values = getattr(self, name)
+            setattr(self, name, array(values.typecode, [values[i] for i in kept]))
+
+    def draw(self, screen, shift=0.0):
+        """Drawing every entity with a single blits call, shifted right by shift pixels"""
+        images = self.images
+        screen.blits([(images[kind], (left + shift, top)) for kind, left, top in zip(self.kind, self.left, self.top)],
+                     False)
+
+    def rects(self):
+        """Returns the (left, top, width, height) of each entity as drawn"""
+        images = self.images
+        return [(left, top) + images[kind].get_size() for kind, left, top in zip(self.kind, self.left, self.top)]
+
+    def get_state(self):
+        """Returns the entities as (kind, x, y) tuples, see TRexEngine.snapshot"""
+        return tuple(zip(self.kind, self.x, self.y))
+
+    def set_state(self, state):
+        self.clear()
+        for kind, x, y in state:
+            self.add(kind, x, y)
+
+
+class ParallaxLayer:
+    """Draws an entity store with a single blit of a cached strip holding all of its entities
+
+    The entities of a store all move by the same velocity so they keep their places on the strip, which is only
+    composited again when an entity is added or dropped. The strip follows the first entity, the centered entities
+    round their own float x so the others may be drawn a pixel off their exact place"""
+
+    def __init__(self, store):
+        self.store = store
+        self.version = None
+        self.strip = None
+        # position of the strip left from the first entity and of its top on the screen
+        self.dx = 0
+        self.top = 0
+
+    def draw(self, screen, shift=0.0):
+        store = self.store
+        if not len(store):
+            return
+        if store.version != self.version:
+            self._composite()
+        # blits truncate float positions toward zero, the strip often starts left of the screen where that would move
+        # it a pixel right of the entities it holds
+        screen.blit(self.strip, (store.left[0] + self.dx + int(shift), self.top))
+
+    def _composite(self):
+        store = self.store
+        rects = store.rects()
+        left = min(rect[0] for rect in rects)
+        top = min(rect[1] for rect in rects)
+        right = max(rect[0] + rect[2] for rect in rects)
+        bottom = max(rect[1] + rect[3] for rect in rects)
+        strip = pygame.Surface((right - left, bottom - top), pygame.SRCALPHA)
+        # copying the pixels instead of blending them on the transparent strip, which would darken the soft edges
+        strip.blits([(store.images[kind], (x - left, y - top), None, pygame.BLEND_RGBA_MAX)
+                     for kind, x, y in zip(store.kind, store.left, store.top)], False)
+        # the strip is mostly transparent, run length encoded its blit skips the transparent runs
+        strip.set_alpha(255, pygame.RLEACCEL)
+        self.strip = strip
+        self.dx = left - store.left[0]
+        self.top = top
+        self.version = store.version
+
+
+class ScrollingGround:
+    """The endless ground, the ground image tiled once on a surface wider than the screen and scrolled by a wrapping
+    offset, so moving it is one addition and drawing it one blit, nothing is built or loaded while playing
+
+    The tiles overlap by overlap pixels like the ground sprites did when one was attached to the previous one. Every
+    point of the ground lies at floor_y, where the trex, the cacti and the birds are placed from"""
+
+    def __init__(self, image, screen_rect, overlap=15):
+        self.period = image.get_width() - overlap
+        self.height = image.get_height()
+        self.floor_y = _round(screen_rect.height * 0.75)
+        # the surface is drawn from up to one period left of the screen, so it covers the screen for every offset
+        width = self.period + screen_rect.width
+        self.surface = pygame.Surface((width, self.height), pygame.SRCALPHA)
+        self.surface.blits([(image, (x, 0), None, pygame.BLEND_RGBA_MAX) for x in range(0, width, self.period)],
+                           False)
+        self.surface.set_alpha(255, pygame.RLEACCEL)
+        # how far the ground has scrolled left since the start of the current tile, it keeps the fractions of a pixel
+        # and is rounded like a Rect when drawn
+        self.offset = 0
+
+    def reset(self):
+        self.offset = 0
+
+    def update(self, velocity):
+        self.offset = (self.offset + velocity) % self.period
+
+    def draw(self, screen, shift=0.0):
+        """Drawing the ground shifted right by shift pixels"""
+        x = int(shift) - _round(self.offset)
+        if x > 0:
+            x -= self.period
+        screen.blit(self.surface, (x, self.floor_y))
+
+    def get_state(self):
+        return self.offset
+
+    def set_state(self, state):
+        self.offset = state
@@ -0,0 +1,178 @@
+"""Evaluating policies over many seeded headless games
+
+Each policy is a "module:attribute" path, see rollout.load_policy, and plays the same seeds so the policies, or the
+same policy under different settings, can be compared game by game:
+
+    python evaluate.py policies:jumper --episodes 2000
+    python evaluate.py policies:jumper policies:noop --episodes 500 --workers 8 --output results.csv
+    python evaluate.py policies:jumper --set difficulty_scale=0.08 --set "cacti_gap=(7, 12)" --output results.npz
+
+The score is reported with the confidence interval of its mean and of its median, the policies after the first also
+with the interval of their mean score difference to the first one over the same seeds. The results of every episode
+are written to a csv file or, for a .npz path, as one NumPy array per column
+"""
+import argparse
+import ast
+import csv
+import math
+import statistics
+import sys
+import time
+from collections import Counter
+
+from rollout import EpisodeResult, RolloutRunner, load_policy, make_engine, try_episode
+
+COLUMNS = ("policy",) + EpisodeResult._fields
+# episodes which did not play to their end, they are counted but left out of the score statistics
+FAILED = ("crash", "error")
+
+
+def parse_override(text):
+    """Parses a NAME=VALUE override, the value is a Python literal or else a string"""
+    name, separator, value = text.partition("=")
+    if not separator:
+        raise argparse.ArgumentTypeError(f"expected NAME=VALUE, got {text!r}")
+    try:
+        value = ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        pass
+    return name.strip(), value
+
+
+def run_serial(policy_path, seeds, max_frames, settings):
+    """Plays the episodes one after the other in this process, returns the results and the throughput like
+    RolloutRunner.summary"""
+    engine = make_engine(settings)
+    policy = load_policy(policy_path)
+    start = time.perf_counter()
+    results = [try_episode(engine, policy, seed, max_frames) for seed in seeds]
+    elapsed = time.perf_counter() - start
+    frames = sum(result.frames for result in results)
+    errors = sum(result.cause_of_death == "error" for result in results)
+    return results, {"episodes": len(results), "frames": frames, "crashes": 0, "errors": errors, "elapsed": elapsed,
+                     "frames_per_sec": frames / elapsed, "episodes_per_sec": len(results) / elapsed}
+
+
+def evaluate(policy_path, seeds, workers, max_frames, settings=None):
+    """Returns the results of the policy sorted by seed and its throughput"""
+    if workers == 0:
+        results, summary = run_serial(policy_path, seeds, max_frames, settings)
+    else:
+        runner = RolloutRunner(policy_path, workers, max_frames, settings=settings)
+        results = list(runner.run(seeds))
+        summary = runner.summary()
+    results.sort(key=lambda result: result.seed)
+    return results, summary
+
+
+def mean_interval(values, confidence):
+    """Returns the mean and the half width of its confidence interval, from the normal approximation"""
+    mean = statistics.fmean(values)
+    if len(values) < 2:
+        return mean, float("nan")
+    z = statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+    return mean, z * statistics.stdev(values) / math.sqrt(len(values))
+
+
+def median_interval(values, confidence):
+    """Returns the median and its distribution free confidence interval, the order statistics whose ranks are the
+    binomial bounds of the rank of the median"""
+    values = sorted(values)
+    n = len(values)
+    z = statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+    low = max(math.floor(n / 2 - z * math.sqrt(n) / 2), 0)
+    high = min(math.ceil(n / 2 + z * math.sqrt(n) / 2), n - 1)
+    return statistics.median(values), values[low], values[high]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(fraction * len(values)), len(values) - 1)]
+
+
+def report(policy_path, results, summary, confidence, baseline=None):
+    """Returns the statistics of the results of a policy as printable lines, compared to the results of baseline,
+    a (policy path, results) pair played on the same seeds, the crashed and failed episodes are only counted"""
+    failed = Counter(result.cause_of_death for result in results if result.cause_of_death in FAILED)
+    results = [result for result in results if result.cause_of_death not in FAILED]
+    scores = [result.score for result in results]
+    percent = f"{confidence:.0%}"
+    lines = [f"{policy_path}: {summary['episodes']} episodes in {summary['elapsed']:.2f}s, "
+             f"{summary['frames_per_sec']:,.0f} frames/s, {summary['episodes_per_sec']:,.1f} episodes/s"]
+    if failed:
+        lines.append("  failed   " + ", ".join(f"{cause} {count}" for cause, count in failed.most_common()) +
+                     ", left out of the statistics")
+    if not scores:
+        return lines + ["  no episode played"]
+    mean, half = mean_interval(scores, confidence)
+    median, median_low, median_high = median_interval(scores, confidence)
+    lines.append(f"  score    mean {mean:.1f} ± {half:.1f} ({percent} CI {mean - half:.1f} .. {mean + half:.1f})  "
+                 f"median {median:g} ({percent} CI {median_low} .. {median_high})")
+    lines.append(f"           min {min(scores)}  p10 {percentile(scores, 0.1)}  p90 {percentile(scores, 0.9)}  "
+                 f"max {max(scores)}")
+    lines.append(f"  kills    mean {statistics.fmean(result.kills for result in results):.2f}  "
+                 f"frames mean {statistics.fmean(result.frames for result in results):,.0f}")
+    deaths = Counter(result.cause_of_death for result in results)
+    lines.append("  ended by " + ", ".join(f"{cause} {count}" for cause, count in deaths.most_common()))
+    if baseline is not None:
+        baseline_path, baseline_results = baseline
+        baseline_scores = {result.seed: result.score for result in baseline_results
+                           if result.cause_of_death not in FAILED}
+        differences = [result.score - baseline_scores[result.seed] for result in results
+                       if result.seed in baseline_scores]
+        if differences:
+            mean, half = mean_interval(differences, confidence)
+            lines.append(f"  vs {baseline_path}: score {mean:+.1f} ± {half:.1f} ({percent} CI, paired over "
+                         f"{len(differences)} seeds)")
+    return lines
+
+
+def write_results(path, rows):
+    """Writes the (policy path, EpisodeResult) rows to a csv file, or to a .npz file holding an array per column"""
+    if path.endswith(".npz"):
+        import numpy as np
+
+        columns = list(zip(*[(policy,) + tuple(result) for policy, result in rows])) or [()] * len(COLUMNS)
+        np.savez(path, **{name: np.array(values) for name, values in zip(COLUMNS, columns)})
+        return
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(COLUMNS)
+        writer.writerows((policy,) + tuple(result) for policy, result in rows)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Evaluates policies over many seeded headless games")
+    parser.add_argument("policies", nargs="+", help='policies as "module:attribute" paths, e.g. policies:jumper')
+    parser.add_argument("--episodes", type=int, default=1000, help="games played by each policy")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game, the next ones follow it")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes, every cpu by default, 0 plays the games in this process")
+    parser.add_argument("--max-frames", type=int, default=100000, help="frames after which a game is stopped")
+    parser.add_argument("--confidence", type=float, default=0.95, help="level of the confidence intervals")
+    parser.add_argument("--set", type=parse_override, action="append", default=[], metavar="NAME=VALUE",
+                        help="overrides a Settings attribute in every game, the velocities are reset by each game so "
+                             "only the other settings, like difficulty_scale or cacti_gap, can be changed")
+    parser.add_argument("--output", help="file where the result of every episode is written, .csv or .npz")
+    args = parser.parse_args(args)
+
+    settings = dict(args.set)
+    seeds = range(args.seed, args.seed + args.episodes)
+    rows = []
+    baseline = None
+    for policy_path in args.policies:
+        # failing early in this process instead of in every worker
+        load_policy(policy_path)
+        results, summary = evaluate(policy_path, seeds, args.workers, args.max_frames, settings)
+        print("\n".join(report(policy_path, results, summary, args.confidence, baseline)))
+        rows += [(policy_path, result) for result in results]
+        if baseline is None:
+            baseline = (policy_path, results)
+    if args.output:
+        write_results(args.output, rows)
+        print(f"{len(rows)} episodes written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,46 @@
 import pygame
 
+FONT_FILE = "assets/font/PressStart2P-Regular.ttf"
+
+# fonts and glyph atlases are shared by every text element, so the font file is only read once per size
+_fonts = {}
+_atlases = {}
+
+
+def get_font(size):
+    """Returns the game font of the given size, loading it on first use"""
+    if size not in _fonts:
+        _fonts[size] = pygame.font.Font(FONT_FILE, size)
+    return _fonts[size]
+
+
+def render_text(text, size, color):
+    """Renders text with the game font by blitting cached glyphs instead of rasterizing the whole string"""
+    key = (size, color)
+    if key not in _atlases:
+        _atlases[key] = GlyphAtlas(get_font(size), color)
+    return _atlases[key].render(text)
+
+
+class GlyphAtlas:
+    """Pre-rendered glyphs of one font size and color, the game font is monospaced so a string is rendered by
+    placing its glyphs side by side"""
+    def __init__(self, font, color):
+        self.font = font
+        self.color = color
+        self.advance = font.size("0")[0]
+        self.glyphs = {}
+
+    def render(self, text):
+        surface = pygame.Surface(self.font.size(text), pygame.SRCALPHA)
+        for i, char in enumerate(text):
+            if char == " ":
+                continue
+            if char not in self.glyphs:
+                self.glyphs[char] = self.font.render(char, True, self.color)
+            surface.blit(self.glyphs[char], (i * self.advance, 0))
+        return surface
+
 
 class Text:
     """Parent class for most text elements"""
@@ -9,12 +50,20 @@ class Text:
         self.settings = t_game.settings
         self.text_size_animation_vel = self.settings.text_animation_velocity
         self.text_size = self.settings.text_size if text_size is None else text_size
-        self.font = pygame.font.Font("assets/font/PressStart2P-Regular.ttf", self.text_size)
         self.text_color = self.settings.items_color
         self.text = text
-        self.image = self.font.render(self.text, True, self.text_color)
+        self.image = render_text(self.text, self.text_size, self.text_color)
         self.rect = self.image.get_rect()
 
+    def set_text(self, text, color):
+        """Re-rendering the text image only if the text or its color changed"""
+        if text == self.text and color == self.text_color:
+            return
+        self.text = text
+        self.text_color = color
+        self.image = render_text(text, self.text_size, color)
+        self.rect.size = self.image.get_size()
+
     def update(self, *args):
         pass
 
@@ -25,52 +74,29 @@ class Text:
 class Score(Text):
     """Represents and manages everything related to player's score"""
     def __init__(self, t_game):
+        self.high_scores = t_game.high_scores
         self.fetch_high_score()
         super().__init__(t_game, text=f"HI {self.high_score} 00000")
         self.current_score = 0
-        self.current_mile_stone = 0
-        self.should_not_play_sound = False
         self._set_location()
 
-    def update_score(self, deci, play_milestone_sound_callback):
-        # checking if we passed 100 points
-        if deci >= 100 and (deci % 100 == 0 or (deci - self.current_mile_stone) >= 100):
-            self.current_mile_stone = deci
-            if not self.should_not_play_sound:
-                # if we don't have this if condition then the following block will run multiple times
-                play_milestone_sound_callback()
-                self.should_not_play_sound = True
-                self.settings.increase_difficulty()
-        else:
-            self.should_not_play_sound = False
+    def update_score(self, deci, milestone_reached):
         # changing the score color so the player notices that he/she passed new milestone
-        if deci > 100 and deci in range(self.current_mile_stone, self.current_mile_stone + 10):
-            self.text_color = (255, 255, 0)
+        if milestone_reached:
+            text_color = (255, 255, 0)
         else:
-            self.text_color = self.settings.items_color
+            text_color = self.settings.items_color
         self.current_score = self.get_formatted_score(deci)
-        self.score_text = f"HI {self.high_score} {self.current_score}"
-        self._set_high_score()
-        self.image = self.font.render(self.score_text, True, self.text_color)
+        # the store only keeps it in memory, it is written to disk by a background thread
+        self.high_scores.submit(deci)
+        # the score only changes every 10 frames, the image is kept in between
+        self.set_text(f"HI {self.high_score} {self.current_score}", text_color)
         self._set_location()
         self.blit()
 
     def fetch_high_score(self):
-        """Fetching high score from local file"""
-        file = None
-        try:
-            file = open("highest_score.txt")
-            self.high_score = self.get_formatted_score(int(file.readline()))
-        except FileNotFoundError:
-            self.high_score = self.get_formatted_score(0)
-        finally:
-            if file is not None:
-                file.close()
-
-    def _set_high_score(self):
-        if int(self.current_score) > int(self.high_score):
-            with open("highest_score.txt", 'w+') as f:
-                f.write(str(self.current_score))
+        """Fetching high score from the high score store"""
+        self.high_score = self.get_formatted_score(self.high_scores.high_score)
 
     @staticmethod
     def get_formatted_score(deci):
@@ -101,28 +127,32 @@ class StartText(Text):
         self.height = self.rect.height
         self.width = self.rect.width
         self.expanded = True
+        self.size_steps = {self.text_size: self.image}
 
     def update(self):
         """Animating the the text by increasing and decreasing the text size"""
         if self.settings.text_size >= self.text_size > 15 and self.expanded:
             self.text_size -= int(self.text_size_animation_vel)
             self.text_size_animation_vel += 0.08
-            self.font = pygame.font.Font("assets/font/PressStart2P-Regular.ttf", self.text_size)
-            self.image = self.font.render(self.text.upper(), True, self.text_color)
-            self.rect = self.image.get_rect()
+            self._set_size_step()
             if self.text_size == 15:
                 self.text_size_animation_vel = self.settings.text_animation_velocity
                 self.expanded = not self.expanded
         else:
             self.text_size += int(self.text_size_animation_vel)
             self.text_size_animation_vel += 0.08
-            self.font = pygame.font.Font("assets/font/PressStart2P-Regular.ttf", self.text_size)
-            self.image = self.font.render(self.text.upper(), True, self.text_color)
-            self.rect = self.image.get_rect()
+            self._set_size_step()
             if self.text_size == self.settings.text_size:
                 self.text_size_animation_vel = self.settings.text_animation_velocity
                 self.expanded = True
 
+    def _set_size_step(self):
+        """Setting the image of the current text size, each size step is rendered once and reused by the pulse"""
+        if self.text_size not in self.size_steps:
+            self.size_steps[self.text_size] = render_text(self.text.upper(), self.text_size, self.text_color)
+        self.image = self.size_steps[self.text_size]
+        self.rect = self.image.get_rect()
+
     def blit(self, x, y):
         self.rect.center = (x, y)
         self.screen.blit(self.image, self.rect)
@@ -131,7 +161,7 @@ class StartText(Text):
 class Button:
     """Button class that represents the play again button"""
     def __init__(self, t_game):
-        self.image = pygame.image.load("assets/button/button.png")
+        self.image = t_game.assets.image("button/button")
         self.rect = self.image.get_rect()
         self.screen = t_game.screen
         self.screen_rect = self.screen.get_rect()
@@ -149,9 +179,10 @@ class BulletLoadingIndicator:
         self.screen = t_game.screen
         self.screen_rect = t_game.screen.get_rect()
         self.settings = t_game.settings
-        ground = t_game.ground_group.sprites()[0]
+        ground = t_game.ground
         self.rect_size = (self.settings.screen_dimen[0] / 4, self.settings.screen_dimen[1] / 24)
-        self.rect_center = (self.screen_rect.width / 2, (ground.rect.center[1] + self.screen_rect.bottom) / 2)
+        self.rect_center = (self.screen_rect.width / 2,
+                            (ground.floor_y + ground.height // 2 + self.screen_rect.bottom) / 2)
         # outlined
         self.outlined_image = pygame.surface.Surface(self.rect_size)
         self.outlined_image_rect = self.outlined_image.get_rect()
@@ -165,9 +196,8 @@ class BulletLoadingIndicator:
         # text
         text_size = self.settings.text_size
         text_color = self.settings.items_color
-        font = pygame.font.Font("assets/font/PressStart2P-Regular.ttf", text_size)
         text = "reloading".replace("", " ").upper().lstrip()
-        self.text_surface = font.render(text, True, text_color)
+        self.text_surface = render_text(text, text_size, text_color)
         self.text_rect = self.text_surface.get_rect()
         self.text_rect.center = (
             self.rect_center[0], self.rect_center[1] + self.outlined_image_rect.height + self.text_rect.height / 2)
@@ -183,10 +213,12 @@ class BulletsCount(Text):
     """Bullets monitoring text that represents the current bullets in the player's gun"""
     def __init__(self, t_game, text_size=None):
         text = "bullets:".replace("", " ").upper().lstrip()
+        self.label = text
         super().__init__(t_game, text, text_size)
         self.rect.left = self.screen_rect.left + 16
         self.rect.top = self.screen_rect.top + 16
 
     def update(self, bullet_count):
-        self.image = self.font.render(f"{self.text} {bullet_count}", True, self.text_color)
+        # the count is only re-rendered when it changes
+        self.set_text(f"{self.label} {bullet_count}", self.text_color)
         self.blit()
@@ -0,0 +1,146 @@
+"""High score and leaderboard persistence
+
+The high score is kept in memory and written by a background thread, so the frame loop never touches the disk. The
+high score file is replaced atomically and the best runs, with their time and seed, are kept in a SQLite leaderboard:
+
+    python highscores.py    # print the leaderboard
+"""
+import contextlib
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from settings import Settings
+
+
+def read_high_score(path):
+    """Returns the high score stored at path, 0 if there is none yet or the file is unreadable"""
+    try:
+        with open(path) as file:
+            return int(file.readline())
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def write_atomically(path, text):
+    """Writing a whole new file next to path and renaming it over path, a crash leaves either the old or the new
+    file but never a truncated one"""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as file:
+        file.write(text)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+
+def connect(path):
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, score INTEGER NOT NULL, "
+                       "kills INTEGER NOT NULL, seed INTEGER NOT NULL, game INTEGER NOT NULL, "
+                       "finished_at REAL NOT NULL)")
+    connection.execute("CREATE INDEX IF NOT EXISTS runs_by_score ON runs (score DESC, finished_at)")
+    return connection
+
+
+def top_runs(path, count=10):
+    """Returns the best runs of the leaderboard as (score, kills, seed, game, finished_at) tuples"""
+    if not os.path.exists(path):
+        return []
+    # the with block of a connection only ends its transaction, closing() closes it
+    with contextlib.closing(connect(path)) as connection:
+        return connection.execute("SELECT score, kills, seed, game, finished_at FROM runs "
+                                  "ORDER BY score DESC, finished_at LIMIT ?", (count,)).fetchall()
+
+
+class HighScoreStore:
+    """Keeps the high score in memory, a background writer saves it at most once per flush_interval seconds while it
+    changes and right away when a run ends, along with the run in the leaderboard"""
+
+    def __init__(self, path, leaderboard_path, leaderboard_size=10, flush_interval=5.0):
+        self.path = path
+        self.leaderboard_path = leaderboard_path
+        self.leaderboard_size = leaderboard_size
+        self.flush_interval = flush_interval
+        # read once at startup, before the frame loop
+        self.high_score = read_high_score(path)
+        self.saved_high_score = self.high_score
+        self.pending_runs = []
+        self.last_flush = 0.0
+        self.closed = False
+        self.condition = threading.Condition()
+        self.writer = threading.Thread(target=self._write_loop, name="high-score-writer", daemon=True)
+        self.writer.start()
+
+    def submit(self, score):
+        """Offering the current score, it only becomes the high score if it beats it"""
+        if score > self.high_score:
+            with self.condition:
+                self.high_score = score
+                self.condition.notify()
+
+    def record_run(self, score, kills, seed, game):
+        """Adding a finished run to the leaderboard, it is written right away"""
+        with self.condition:
+            self.pending_runs.append((score, kills, seed, game, time.time()))
+            self.condition.notify()
+
+    def close(self):
+        """Writing what is left and stopping the writer"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.writer.join()
+
+    def _write_loop(self):
+        connection = None
+        while True:
+            with self.condition:
+                while True:
+                    if self.pending_runs or self.closed:
+                        break
+                    if self.high_score != self.saved_high_score:
+                        # throttling the writes of a high score which keeps growing during a run
+                        wait = self.last_flush + self.flush_interval - time.monotonic()
+                        if wait <= 0:
+                            break
+                        self.condition.wait(wait)
+                    else:
+                        self.condition.wait()
+                high_score = self.high_score
+                runs, self.pending_runs = self.pending_runs, []
+                closed = self.closed
+            if high_score != self.saved_high_score:
+                write_atomically(self.path, str(high_score))
+                self.saved_high_score = high_score
+            if runs:
+                if connection is None:
+                    connection = connect(self.leaderboard_path)
+                with connection:
+                    connection.executemany("INSERT INTO runs (score, kills, seed, game, finished_at) "
+                                           "VALUES (?, ?, ?, ?, ?)", runs)
+                    # only the best runs are kept
+                    connection.execute("DELETE FROM runs WHERE id NOT IN (SELECT id FROM runs "
+                                       "ORDER BY score DESC, finished_at LIMIT ?)", (self.leaderboard_size,))
+            self.last_flush = time.monotonic()
+            if closed:
+                if connection is not None:
+                    connection.close()
+                return
+
+
+def main():
+    settings = Settings()
+    runs = top_runs(settings.leaderboard_file, settings.leaderboard_size)
+    if not runs:
+        print("the leaderboard is empty")
+        return 0
+    for rank, (score, kills, seed, game, finished_at) in enumerate(runs, 1):
+        finished = time.strftime("%Y-%m-%d %H:%M", time.localtime(finished_at))
+        print(f"{rank:3}. {score:6} points {kills:4} kills  {finished}  seed {seed} game {game}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
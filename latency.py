@@ -0,0 +1,51 @@
+import time
+
+from profiler import percentile
+
+
+class LatencyProbe:
+    """Measures the time from a KEYDOWN to the flip of the first frame showing the change it made to the trex
+
+    A key press is timestamped when the front end reads it from the event queue and the view is whatever the front end
+    passes, a tuple which changes when the input took effect. Presses which did not change the view after timeout
+    seconds are dropped"""
+
+    def __init__(self, bucket_ms=4, buckets=16, timeout=0.5):
+        self.bucket_ms = bucket_ms
+        self.timeout = timeout
+        # the last bucket also counts every latency above it
+        self.counts = [0] * buckets
+        self.latencies = []
+        self.pending = []
+
+    def key_down(self, view):
+        self.pending.append((time.perf_counter(), view))
+
+    def flipped(self, view):
+        """Called right after pygame.display.flip with the view of the frame just shown"""
+        if not self.pending:
+            return
+        now = time.perf_counter()
+        still_pending = []
+        for pressed, pressed_view in self.pending:
+            if view != pressed_view:
+                latency = (now - pressed) * 1000
+                self.latencies.append(latency)
+                self.counts[min(int(latency // self.bucket_ms), len(self.counts) - 1)] += 1
+            elif now - pressed < self.timeout:
+                still_pending.append((pressed, pressed_view))
+        self.pending = still_pending
+
+    def report(self):
+        """Returns the histogram and the percentiles of the measured latencies as printable lines"""
+        if not self.latencies:
+            return ["no input latency measured"]
+        values = sorted(self.latencies)
+        lines = [f"input to display latency over {len(values)} presses: p50 {percentile(values, 0.5):.1f} ms "
+                 f"p95 {percentile(values, 0.95):.1f} ms p99 {percentile(values, 0.99):.1f} ms"]
+        most = max(self.counts)
+        for i, count in enumerate(self.counts):
+            low = i * self.bucket_ms
+            label = f"{low:3}-{low + self.bucket_ms:<3} ms" if i < len(self.counts) - 1 else f"{low:3}+     ms"
+            lines.append(f"{label} {count:6} {'#' * round(count / most * 40)}")
+        return lines
@@ -0,0 +1,106 @@
+import sys
+
+import numpy as np
+import pygame
+
+from engine import TRexEngine
+
+# ITU-R 601 luma weights of the red, green and blue channels
+LUMA = (0.299, 0.587, 0.114)
+
+
+def _box(length, bins):
+    """Returns the (bins, length) matrix averaging length pixels into bins nearly equal bins"""
+    edges = np.arange(bins + 1) * length // bins
+    matrix = np.zeros((bins, length), dtype=np.float32)
+    for i in range(bins):
+        matrix[i, edges[i]:edges[i + 1]] = 1 / (edges[i + 1] - edges[i])
+    return matrix
+
+
+class PixelEnv:
+    """A headless engine observed through its rendered frames, for agents learning from pixels
+
+    Each step the world is drawn on the engine screen, read in place through pygame.surfarray.pixels2d, shrunk to
+    size (width, height) and, when grayscale is True, turned into luma. The last stack frames are kept in a buffer
+    allocated once, the observation is a (stack, height, width) array, (stack, height, width, 3) in color, oldest
+    frame first
+
+    resample is "nearest" to sample one screen pixel per observed pixel, the fastest, or "area" to average every
+    screen pixel, which keeps the thin bullets and ground line from flickering in and out at the cost of reading the
+    whole screen"""
+
+    def __init__(self, engine=None, size=(84, 84), grayscale=True, stack=4, resample="nearest"):
+        if resample not in ("nearest", "area"):
+            raise ValueError(f"unknown resample {resample!r}")
+        self.engine = TRexEngine() if engine is None else engine
+        self.size = size
+        self.grayscale = grayscale
+        self.stack = stack
+        self.resample = resample
+        screen = self.engine.screen
+        screen_width, screen_height = screen.get_size()
+        width, height = size
+        # byte of the red, green and blue channels in a 32 bit pixel of the screen
+        self._channels = [shift // 8 if sys.byteorder == "little" else 3 - shift // 8
+                          for shift in screen.get_shifts()[:3]]
+        self._luma = np.zeros(4, dtype=np.float32)
+        self._luma[self._channels] = LUMA
+        if resample == "nearest":
+            # the screen pixel at the center of each observed pixel, indexed (x, y) like the surfarray view
+            self._xs = ((np.arange(width) + 0.5) * screen_width / width).astype(np.intp)[None, :]
+            self._ys = ((np.arange(height) + 0.5) * screen_height / height).astype(np.intp)[:, None]
+        else:
+            self._rows = _box(screen_height, height)
+            self._columns = _box(screen_width, width)
+        shape = (height, width) if grayscale else (height, width, 3)
+        # every frame is written twice, at index and index + stack, so the last stack frames are always the
+        # contiguous slice frames[index + 1:index + 1 + stack] and stacking them never copies
+        self.frames = np.zeros((2 * stack,) + shape, dtype=np.uint8)
+        self.index = stack - 1
+
+    def reset(self, seed=None):
+        """Resets the game and returns an observation filled with its first frame"""
+        self.engine.reset(seed)
+        self.frames[:] = self._capture()
+        self.index = self.stack - 1
+        return self.observation()
+
+    def step(self, action):
+        """Plays one action like TRexEngine.step, returns (observation, reward, done)"""
+        _, reward, done = self.engine.step(action)
+        self.push(self._capture())
+        return self.observation(), reward, done
+
+    def push(self, frame):
+        self.index = (self.index + 1) % self.stack
+        self.frames[self.index] = frame
+        self.frames[self.index + self.stack] = frame
+
+    def observation(self):
+        """Returns the stacked frames, a view of the buffer overwritten by the next steps, copy it to keep it"""
+        start = self.index + 1
+        return self.frames[start:start + self.stack]
+
+    def _capture(self):
+        """Drawing the engine screen and returning it as one observed frame"""
+        self.engine.render()
+        # a (width, height) view of the 32 bit pixels, it locks the screen so it is released before the next render
+        pixels = pygame.surfarray.pixels2d(self.engine.screen)
+        if self.resample == "nearest":
+            # only the sampled pixels are copied out of the view
+            frame = pixels[self._xs, self._ys].view(np.uint8).reshape(self.size[1], self.size[0], 4)
+            del pixels
+            if self.grayscale:
+                return frame @ self._luma
+            return frame[..., self._channels]
+        # the transposed view is the screen as (height, width, 4) bytes, averaging is linear so the bins are averaged
+        # with one matrix product per axis, after the luma when grayscale so there is a single channel to average
+        screen = pixels.T.view(np.uint8).reshape(pixels.shape[1], pixels.shape[0], 4)
+        if self.grayscale:
+            frame = self._rows @ (screen @ self._luma) @ self._columns.T
+        else:
+            rows = self._rows @ screen.reshape(screen.shape[0], -1).astype(np.float32)
+            frame = (self._columns @ rows.reshape(rows.shape[0], -1, 4))[..., self._channels]
+        del pixels, screen
+        return frame
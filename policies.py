@@ -0,0 +1,28 @@
+from engine import CROUCH, JUMP, NOOP, SHOOT
+
+# the trex rect is 88 pixels wide and centered at x=88, its top is at 339 while crouching
+TREX_LEFT = 44
+TREX_RIGHT = 132
+TREX_CROUCH_TOP = 339
+
+
+def noop(observation):
+    """Never does anything, the trex runs into the first obstacle"""
+    return NOOP
+
+
+def jumper(observation):
+    """Shoots at the obstacles ahead, jumps over the ones which get close and crouches under the high birds"""
+    for kind, x, y, width, height in observation["obstacles"]:
+        if x + width < TREX_LEFT:
+            continue
+        distance = x - TREX_RIGHT
+        velocity = observation["bird_velocity"] if kind == "bird" else observation["ground_velocity"]
+        if kind == "bird" and y + height <= TREX_CROUCH_TOP:
+            return CROUCH if distance < velocity * 4 else NOOP
+        if distance < velocity * 4:
+            return JUMP
+        if observation["bullets"] and distance < 400:
+            return SHOOT
+        return NOOP
+    return NOOP
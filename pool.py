@@ -0,0 +1,48 @@
+class SpritePool:
+    """Keeps killed sprites of one class around to reuse them instead of building new ones
+
+    A sprite acquired from the pool is either a released sprite placed again with reinit(*args), a hit, or a new
+    sprite_class(t_game, *args), a miss. At most max_size sprites are kept, the extra ones are left to the garbage
+    collector, so after the first seconds of play every sprite comes from a pool and the misses stop growing"""
+
+    def __init__(self, sprite_class, max_size):
+        self.sprite_class = sprite_class
+        self.max_size = max_size
+        self.free = []
+        self.hits = 0
+        self.misses = 0
+
+    def acquire(self, t_game, *args):
+        if self.free:
+            self.hits += 1
+            sprite = self.free.pop()
+            sprite.in_pool = False
+            sprite.reinit(*args)
+            return sprite
+        self.misses += 1
+        sprite = self.sprite_class(t_game, *args)
+        sprite.pool = self
+        return sprite
+
+    def acquire_state(self, t_game, state):
+        """Same as acquire, but the sprite is put back in a state returned by its get_state"""
+        if self.free:
+            self.hits += 1
+            sprite = self.free.pop()
+            sprite.in_pool = False
+        else:
+            self.misses += 1
+            sprite = self.sprite_class(t_game)
+            sprite.pool = self
+        sprite.set_state(state)
+        return sprite
+
+    def release(self, sprite):
+        """Taking back a killed sprite, releasing a sprite twice does nothing"""
+        if sprite.in_pool or len(self.free) >= self.max_size:
+            return
+        sprite.in_pool = True
+        self.free.append(sprite)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "free": len(self.free)}
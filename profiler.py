@@ -0,0 +1,107 @@
+import csv
+import time
+from collections import deque
+
+from extra import render_text
+
+# phases of a frame in the order they are shown in the overlay and written to the csv file
+PHASES = ("update", "collisions", "draw", "text", "events", "video", "flip", "wait")
+
+
+def percentile(sorted_values, fraction):
+    """Returns the nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+class NullProfiler:
+    """Profiler used when the instrumentation is disabled, every call does nothing"""
+
+    def begin_frame(self):
+        pass
+
+    def mark(self, phase):
+        pass
+
+    def end_frame(self):
+        pass
+
+    def draw(self, screen):
+        pass
+
+    def close(self):
+        pass
+
+
+class FrameProfiler:
+    """Times each phase of a frame with a monotonic clock, keeps rolling percentiles of the last frames and
+    optionally writes a row per frame to a csv file"""
+
+    def __init__(self, window=300, csv_path=None, overlay=False):
+        # the percentiles are computed over the last window frames
+        self.samples = {phase: deque(maxlen=window) for phase in PHASES + ("frame",)}
+        self.overlay = overlay
+        self.frame = 0
+        self.current = dict.fromkeys(PHASES, 0.0)
+        self.frame_start = self.last_mark = time.perf_counter()
+        self.csv_file = None
+        if csv_path is not None:
+            self.csv_file = open(csv_path, "w", newline="")
+            self.csv_writer = csv.writer(self.csv_file)
+            self.csv_writer.writerow(("frame",) + PHASES + ("frame_ms",))
+        # the overlay text is only refreshed a few times per second so drawing it stays cheap
+        self.overlay_interval = 30
+        self.overlay_images = []
+
+    def begin_frame(self):
+        self.frame_start = self.last_mark = time.perf_counter()
+
+    def mark(self, phase):
+        """Adding the time spent since the previous mark to the given phase"""
+        now = time.perf_counter()
+        self.current[phase] += (now - self.last_mark) * 1000
+        self.last_mark = now
+
+    def end_frame(self):
+        frame_ms = (time.perf_counter() - self.frame_start) * 1000
+        for phase in PHASES:
+            self.samples[phase].append(self.current[phase])
+        self.samples["frame"].append(frame_ms)
+        if self.csv_file is not None:
+            self.csv_writer.writerow([self.frame] + [round(self.current[phase], 4) for phase in PHASES] +
+                                     [round(frame_ms, 4)])
+        self.current = dict.fromkeys(PHASES, 0.0)
+        self.frame += 1
+
+    def percentiles(self):
+        """Returns {phase: (p50, p95, p99)} in millis over the rolling window"""
+        result = {}
+        for phase, samples in self.samples.items():
+            values = sorted(samples)
+            result[phase] = (percentile(values, 0.5), percentile(values, 0.95), percentile(values, 0.99))
+        return result
+
+    def draw(self, screen):
+        """Drawing a compact table of the percentiles at the bottom left of the screen"""
+        if not self.overlay:
+            return
+        if self.frame % self.overlay_interval == 0 or not self.overlay_images:
+            color = (141, 203, 159)
+            lines = [f"{'phase':10} {'p50':>6} {'p95':>6} {'p99':>6}"]
+            for phase, (p50, p95, p99) in self.percentiles().items():
+                lines.append(f"{phase:10} {p50:6.2f} {p95:6.2f} {p99:6.2f}")
+            self.overlay_images = [render_text(line, 8, color) for line in lines]
+        y = screen.get_height() - len(self.overlay_images) * 10 - 4
+        # clearing the overlay area first, the game over screen is drawn over the last frame without a fill
+        width = max(image.get_width() for image in self.overlay_images)
+        screen.fill((0, 0, 0), (0, y - 4, width + 8, len(self.overlay_images) * 10 + 8))
+        for image in self.overlay_images:
+            screen.blit(image, (4, y))
+            y += 10
+
+    def close(self):
+        if self.csv_file is not None:
+            self.csv_file.close()
+            self.csv_file = None
@@ -0,0 +1,156 @@
+"""Recording and replaying game sessions
+
+A session is recorded as its seed, its tick rate, the time of each engine frame (a simulation tick) and a
+frame-indexed log of the KEYDOWN, KEYUP and MOUSEBUTTONDOWN inputs of the player. Replaying it runs the headless engine
+as fast as possible and checks that the session ends with the same score:
+
+    python replay.py session.trex
+    python replay.py session.trex --render-every 600 --frames-dir frames
+"""
+import argparse
+import array
+import os
+import struct
+import sys
+import time
+import zlib
+
+import pygame
+
+from engine import SimulatedClock, TRexEngine
+from settings import Settings
+
+MAGIC = b"TREX"
+VERSION = 1
+# magic, version, tick rate, seed, start ticks, frame count, input count, then the final score, addition and kills
+# used to verify a replay, the frame times and inputs follow compressed
+HEADER = struct.Struct("<4sBHQQIIQQI")
+
+
+class Session:
+    """A recorded session"""
+
+    def __init__(self, seed, start_ticks, tick_rate=60):
+        self.seed = seed
+        self.start_ticks = start_ticks
+        self.tick_rate = tick_rate
+        # millis elapsed since the previous frame, one entry per frame
+        self.frame_times = array.array("I")
+        # (frames played before the input, event type, key) triples
+        self.inputs = array.array("I")
+        # final state of the recorded session
+        self.score = 0
+        self.addition = 0
+        self.kills = 0
+
+    def save(self, path):
+        payload = self.frame_times.tobytes() + self.inputs.tobytes()
+        with open(path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, VERSION, self.tick_rate, self.seed, self.start_ticks, len(self.frame_times),
+                                   len(self.inputs) // 3, self.score, self.addition, self.kills))
+            file.write(zlib.compress(payload, 9))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as file:
+            header = file.read(HEADER.size)
+            payload = zlib.decompress(file.read())
+        magic, version, tick_rate, seed, start_ticks, frames, inputs, score, addition, kills = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} session recording")
+        session = cls(seed, start_ticks, tick_rate)
+        session.frame_times.frombytes(payload[:frames * session.frame_times.itemsize])
+        session.inputs.frombytes(payload[frames * session.frame_times.itemsize:])
+        if len(session.inputs) != inputs * 3:
+            raise ValueError(f"{path} is truncated")
+        session.score, session.addition, session.kills = score, addition, kills
+        return session
+
+
+class SessionRecorder:
+    """Records the session played by the front end"""
+
+    def __init__(self, seed, start_ticks, tick_rate=60):
+        self.session = Session(seed, start_ticks, tick_rate)
+        self.last_ticks = start_ticks
+
+    def record_frame(self, ticks):
+        """Recording the sampled time of a new frame"""
+        self.session.frame_times.append(ticks - self.last_ticks)
+        self.last_ticks = ticks
+
+    def record_input(self, event_type, key=0):
+        """Recording an input read after the frames recorded so far, the inputs read before the first frame are
+        recorded at 0"""
+        self.session.inputs.extend((len(self.session.frame_times), event_type, key))
+
+    def save(self, path, engine):
+        self.session.score = engine.score
+        self.session.addition = engine.addition
+        self.session.kills = engine.kills
+        self.session.save(path)
+
+
+def replay(session, render_every=0, on_render=None):
+    """Replays a session on a headless engine and returns the engine, every render_every frames the world is drawn
+    to the engine screen and passed to on_render(screen, frame)"""
+    settings = Settings()
+    settings.tick_rate = session.tick_rate
+    clock = SimulatedClock()
+    clock.ticks = session.start_ticks
+    engine = TRexEngine(clock=clock, settings=settings)
+    engine.reset(session.seed)
+    inputs = session.inputs
+    i = 0
+    # the inputs read before the first frame
+    while i < len(inputs) and inputs[i] == 0:
+        engine.handle_input(inputs[i + 1], inputs[i + 2])
+        i += 3
+    for frame, frame_time in enumerate(session.frame_times):
+        # same order as TRexRunner.start_game, the frame is updated and the inputs read after it are applied
+        clock.ticks += frame_time
+        engine.update()
+        while i < len(inputs) and inputs[i] == frame + 1:
+            engine.handle_input(inputs[i + 1], inputs[i + 2])
+            i += 3
+        if render_every and frame % render_every == 0:
+            engine.render()
+            if on_render is not None:
+                on_render(engine.screen, frame)
+    return engine
+
+
+def verify(session, engine):
+    """Returns whether a replay ended in the same state as the recorded session"""
+    return (engine.score, engine.addition, engine.kills) == (session.score, session.addition, session.kills)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Replays a recorded T-Rex session as fast as possible")
+    parser.add_argument("session", help="session file recorded with Settings.record_session")
+    parser.add_argument("--render-every", type=int, default=0, help="draw one frame out of this many, 0 disables it")
+    parser.add_argument("--frames-dir", help="directory where the drawn frames are saved as png files")
+    args = parser.parse_args(args)
+
+    session = Session.load(args.session)
+    on_render = None
+    if args.frames_dir:
+        os.makedirs(args.frames_dir, exist_ok=True)
+
+        def on_render(screen, frame):
+            pygame.image.save(screen, os.path.join(args.frames_dir, f"frame-{frame:07}.png"))
+    start = time.perf_counter()
+    engine = replay(session, args.render_every, on_render)
+    elapsed = time.perf_counter() - start
+    duration = sum(session.frame_times) / 1000
+    print(f"{len(session.frame_times)} frames, {duration:.1f}s of play replayed in {elapsed:.2f}s "
+          f"({duration / elapsed:.0f}x)")
+    print(f"score {engine.score} kills {engine.kills}, recorded score {session.score} kills {session.kills}")
+    if not verify(session, engine):
+        print("replay diverged from the recorded session")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
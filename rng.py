@@ -0,0 +1,49 @@
+import hashlib
+import os
+import random
+
+MASK = (1 << 64) - 1
+
+
+class GameRandom(random.Random):
+    """random.Random running on SplitMix64, its whole state is a single int
+
+    The Mersenne Twister state of random.Random is 625 ints, saving and restoring it costs tens of microseconds, while
+    a snapshot of the game only has to copy this int. Every method of random.Random (randrange, randint, choices...)
+    works on top of getrandbits and random"""
+
+    def __init__(self, x=None):
+        self.state = 0
+        super().__init__(x)
+
+    def seed(self, a=None, version=2):
+        if a is None:
+            a = int.from_bytes(os.urandom(8), "little")
+        elif not isinstance(a, int):
+            a = int.from_bytes(hashlib.sha512(str(a).encode()).digest()[:8], "little")
+        self.state = a & MASK
+        self.gauss_next = None
+
+    def getstate(self):
+        return self.state
+
+    def setstate(self, state):
+        self.state = state
+        self.gauss_next = None
+
+    def _next(self):
+        self.state = state = (self.state + 0x9E3779B97F4A7C15) & MASK
+        z = ((state ^ (state >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK
+        return z ^ (z >> 31)
+
+    def random(self):
+        return (self._next() >> 11) * (1.0 / (1 << 53))
+
+    def getrandbits(self, k):
+        if k <= 64:
+            return self._next() >> (64 - k)
+        bits = 0
+        for shift in range(0, k, 64):
+            bits |= self._next() << shift
+        return bits & ((1 << k) - 1)
@@ -0,0 +1,153 @@
+import importlib
+import os
+import time
+import traceback
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from engine import TRexEngine
+from settings import Settings
+
+# compact result streamed back from the workers for each played episode
+# kill_points is the engine addition counter, 4 points per killed cactus and 8 per killed bird
+# cause_of_death is "cactus", "bird", "timeout" when max_frames was reached, "error" when the policy or the engine
+# raised an exception or "crash" when the worker died
+EpisodeResult = namedtuple("EpisodeResult", "seed score frames kills kill_points cause_of_death")
+
+# every worker process builds its engine once and keeps it, so the assets are loaded once per process
+_engine = None
+_policies = {}
+
+
+def load_policy(path):
+    """Loads a policy from a "module:attribute" path, a policy is a callable taking an observation and returning
+    an action"""
+    module_name, _, attribute = path.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def make_engine(overrides=None):
+    """Returns a headless engine whose settings have the attributes of overrides changed, for trying balance changes
+    without editing settings.py"""
+    settings = Settings()
+    for name, value in (overrides or {}).items():
+        if not hasattr(settings, name):
+            raise ValueError(f"unknown setting {name!r}")
+        setattr(settings, name, value)
+    return TRexEngine(settings=settings)
+
+
+def run_episode(engine, policy, seed, max_frames):
+    """Plays one seeded episode with the given engine and policy"""
+    observation = engine.reset(seed)
+    done = False
+    frames = 0
+    while not done and frames < max_frames:
+        observation, _, done = engine.step(policy(observation))
+        frames += 1
+    cause_of_death = engine.cause_of_death if done else "timeout"
+    return EpisodeResult(seed, engine.score, frames, engine.kills, engine.addition, cause_of_death)
+
+
+def try_episode(engine, policy, seed, max_frames):
+    """Same as run_episode, but an exception raised by the policy or the engine is printed and the episode is
+    reported as an "error" instead of aborting the other episodes"""
+    try:
+        return run_episode(engine, policy, seed, max_frames)
+    except Exception:
+        traceback.print_exc()
+        return EpisodeResult(seed, 0, 0, 0, 0, "error")
+
+
+def _init_worker(overrides=None):
+    global _engine
+    _engine = make_engine(overrides)
+
+
+def _run_shard(policy_path, seeds, max_frames):
+    """Runs a shard of episodes inside a worker"""
+    if policy_path not in _policies:
+        _policies[policy_path] = load_policy(policy_path)
+    policy = _policies[policy_path]
+    return [try_episode(_engine, policy, seed, max_frames) for seed in seeds]
+
+
+class RolloutRunner:
+    """Plays seeded episodes of a policy on a pool of worker processes and streams back their results"""
+
+    def __init__(self, policy, workers=None, max_frames=100000, shard_size=4, retries=1, settings=None):
+        """policy is a "module:attribute" path so it can be imported by the workers, settings the overrides given to
+        make_engine"""
+        self.policy = policy
+        self.settings = settings
+        self.workers = os.cpu_count() if workers is None else workers
+        self.max_frames = max_frames
+        self.shard_size = shard_size
+        # how many times the episodes lost with a dead worker are retried on a new pool before the remaining ones
+        # are played one by one to find the crashing episodes
+        self.retries = retries
+        # aggregate statistics of the last run
+        self.episodes = 0
+        self.frames = 0
+        self.crashes = 0
+        self.errors = 0
+        self.elapsed = 0.0
+
+    def run(self, seeds):
+        """Yields an EpisodeResult for each seed as soon as its shard is done, the order is not kept"""
+        seeds = list(seeds)
+        shards = [tuple(seeds[i:i + self.shard_size]) for i in range(0, len(seeds), self.shard_size)]
+        self.episodes = self.frames = self.crashes = self.errors = 0
+        start = time.perf_counter()
+        try:
+            for _ in range(1 + self.retries):
+                if not shards:
+                    break
+                # the shards which were running when a worker died are retried on a new pool as single episodes
+                lost = yield from self._run_pool(shards, self.workers)
+                shards = [(seed,) for shard in lost for seed in shard]
+            # the remaining suspects are played one by one on their own pool, so only the episodes which really
+            # kill their worker are reported as crashes
+            for shard in shards:
+                if (yield from self._run_pool([shard], 1)):
+                    self.crashes += 1
+                    yield self._count(EpisodeResult(shard[0], 0, 0, 0, 0, "crash"))
+        finally:
+            self.elapsed = time.perf_counter() - start
+
+    def _run_pool(self, shards, workers):
+        """Runs the shards on a new pool and yields their results, returns the shards which were lost because a
+        worker died and broke the pool"""
+        lost = []
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(self.settings,)) as pool:
+            pending = {pool.submit(_run_shard, self.policy, shard, self.max_frames): shard for shard in shards}
+            for future in as_completed(pending):
+                try:
+                    results = future.result()
+                except BrokenProcessPool:
+                    lost.append(pending[future])
+                    continue
+                for result in results:
+                    yield self._count(result)
+        return lost
+
+    def _count(self, result):
+        self.episodes += 1
+        self.frames += result.frames
+        if result.cause_of_death == "error":
+            self.errors += 1
+        return result
+
+    def summary(self):
+        """Returns the aggregate throughput of the last run"""
+        elapsed = self.elapsed or float("inf")
+        return {
+            "episodes": self.episodes,
+            "frames": self.frames,
+            "crashes": self.crashes,
+            "errors": self.errors,
+            "elapsed": self.elapsed,
+            "frames_per_sec": self.frames / elapsed,
+            "episodes_per_sec": self.episodes / elapsed,
+        }
@@ -1,10 +1,13 @@
-import random
+from rng import GameRandom
 
 
 class Settings:
     """Settings class which is responsible for most game settings"""
     def __init__(self):
         """Init static and nonstatic settings"""
+        # every random decision of the game comes from this generator, so a game is reproducible from its seed, its
+        # state is a single int so snapshots of the game stay cheap
+        self.random = GameRandom()
         # static settings
         self.screen_dimen = (1000, 500)
         self.screen_background_color = (5, 11, 7)
@@ -18,12 +21,65 @@ class Settings:
         self.text_size = 20
         self.jump_count = 14
         self.gravity = 0.8
-        self.fps = 25
+        # frames drawn per second at most, the game itself moves by fixed ticks of 1 / tick_rate seconds
+        self.fps = 60
+        # the world is drawn at this fraction of the window resolution and upscaled once per frame, 0.5 roughly
+        # halves the fill and blit cost on slow hosts, the game itself always runs in window coordinates
+        self.render_scale = 1
+        # every velocity, the jump and the animations are tuned for 60 ticks per second and scaled to the tick rate by
+        # per_tick, so the game plays at the same speed whatever the tick rate
+        self.tick_rate = 60
+        # a host slower than this many ticks per drawn frame sees the game slow down instead of skipping more frames
+        self.max_ticks_per_frame = 5
+        # waiting for the next frame by spinning instead of sleeping, it paces frames more evenly at the cost of a core
+        self.busy_wait_pacing = False
+        # measuring the time from a key press to the frame showing it, the histogram is printed when the game is closed
+        self.latency_probe = False
         self.difficulty_scale = 0.05
+        # spawn timeline of spawns.py in deciseconds of game time, the gaps between two obstacles are drawn from these
+        # ranges at the starting speed and shrink as the game speeds up
+        self.first_obstacle_deci = 41
+        self.first_bird_deci = 450
+        self.cacti_gap = (9, 14)
+        self.bird_gap = (16, 22)
+        self.min_obstacle_gap = 1
+        # stars and a moon cross the sky once per period
+        self.first_stars_deci = 601
+        self.first_moon_deci = 900
+        self.sky_period = 300
+        # frame timing instrumentation, the overlay and the csv file of per-frame timings are optional
+        self.profile = False
+        self.profile_overlay = False
+        self.profile_csv = None
+        # path of the file where the played session is recorded for replay.py, None disables the recording
+        self.record_session = None
+        # path where the displayed frames are recorded by video.py, a directory of png files for the png codec, the
+        # frames are dropped and counted when the writer falls behind with every buffer in use
+        self.record_video = None
+        self.record_video_codec = "zlib"
+        self.record_video_buffers = 8
+        # path of the JSON Lines file where telemetry.py writes a record of the session every telemetry_interval
+        # seconds, None disables the telemetry, the file is rotated once it grows past telemetry_max_bytes
+        self.telemetry_file = None
+        self.telemetry_interval = 60
+        self.telemetry_max_bytes = 1000000
+        self.telemetry_backups = 5
+        # the high score is written at most once per flush interval while it changes, the leaderboard keeps the best
+        # runs of this machine
+        self.high_score_file = "highest_score.txt"
+        self.high_score_flush_interval = 5
+        self.leaderboard_file = "leaderboard.db"
+        self.leaderboard_size = 10
 
         # nonstatic settings
         self.reset_difficulty()
 
+    def per_tick(self, value):
+        """Returns a velocity tuned for 60 ticks per second scaled to the tick rate, it is left as it is at 60"""
+        if self.tick_rate == 60:
+            return value
+        return value * 60 / self.tick_rate
+
     def increase_difficulty(self):
         """Increases game difficulty by adding 5% of each variable value to itself"""
         self.cloud_velocity += self.cloud_velocity * self.difficulty_scale
@@ -31,14 +87,14 @@ class Settings:
         self.star_velocity += self.star_velocity * self.difficulty_scale
         self.moon_velocity += self.moon_velocity * self.difficulty_scale
         self.bird_velocity += self.bird_velocity * self.difficulty_scale
-        self.bullet_count += random.randint(0, 1)
+        self.bullet_count += self.random.randint(0, 1)
 
     def reset_difficulty(self):
         """Initializing / Resetting nonstatic variables"""
-        self.cloud_velocity = 1
-        self.ground_velocity = 13
-        self.star_velocity = 0.9
-        self.moon_velocity = 0.8
-        self.bird_velocity = 8
+        self.cloud_velocity = self.per_tick(1)
+        self.ground_velocity = self.per_tick(13)
+        self.star_velocity = self.per_tick(0.9)
+        self.moon_velocity = self.per_tick(0.8)
+        self.bird_velocity = self.per_tick(8)
         self.bullet_count = 2
 
@@ -0,0 +1,121 @@
+import heapq
+from collections import namedtuple
+
+from rng import GameRandom
+
+# deci is the game time in deciseconds the event is due at, params depend on the kind:
+#   "cacti": the ids of the cacti of the group, left to right
+#   "bird": the lane of the bird, 0 in front of the trex head, 1 in front of its legs and 2 overhead
+#   "stars": a (kind, y) pair for each star
+#   "moon": the moon phase
+SpawnEvent = namedtuple("SpawnEvent", "deci kind params")
+
+OBSTACLES = ("cacti", "bird")
+
+
+def _obstacles(random, settings):
+    deci = settings.first_obstacle_deci
+    while True:
+        if deci > settings.first_bird_deci and random.random() < 0.5:
+            yield SpawnEvent(deci, "bird", random.randrange(3))
+            gap = settings.bird_gap
+        else:
+            count = random.choices([1, 2, 3, 4], [.4, .2, .1, .1])[0]
+            yield SpawnEvent(deci, "cacti", tuple(random.sample(range(13), count)))
+            gap = settings.cacti_gap
+        # the game speeds up by difficulty_scale about every 100 deciseconds, the gaps shrink at the same rate so the
+        # obstacles keep their distance on the ground like when a group used to wait for the previous one to leave
+        speed = (1 + settings.difficulty_scale) ** (deci / 100)
+        deci += max(round(random.randint(*gap) / speed), settings.min_obstacle_gap)
+
+
+def _stars(random, settings):
+    height = settings.screen_dimen[1]
+    deci = settings.first_stars_deci
+    while True:
+        stars = tuple((random.randrange(3), random.randrange(int(height * .45), int(height * .60)))
+                      for _ in range(random.randint(1, 3)))
+        yield SpawnEvent(deci, "stars", stars)
+        deci += settings.sky_period
+
+
+def _moons(random, settings):
+    deci = settings.first_moon_deci
+    while True:
+        yield SpawnEvent(deci, "moon", random.randint(0, 6))
+        deci += settings.sky_period
+
+
+def timeline(seed, settings):
+    """Yields the spawn events of the game seeded with seed in the order they are due, forever
+
+    Each kind of event draws from its own generator seeded from seed, so the timeline only depends on the seed and
+    the settings, never on how the game was played"""
+    seeds = GameRandom(seed)
+    streams = [stream(GameRandom(seeds.getrandbits(64)), settings) for stream in (_obstacles, _stars, _moons)]
+    return heapq.merge(*streams, key=lambda event: event.deci)
+
+
+class SpawnScheduler:
+    """Hands out the events of a seeded timeline as the game time reaches them
+
+    The timeline is extended lazily and the events already generated are kept, so a snapshot of the scheduler is its
+    seed and the index of the next event, and looking ahead never changes what the game spawns. Every frame only
+    compares the game time with the next event"""
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.seed = None
+        self.events = []
+        self.index = 0
+        self._timeline = None
+
+    def reset(self, seed):
+        self.seed = seed
+        self.events = []
+        self.index = 0
+        self._timeline = timeline(seed, self.settings)
+
+    def _event(self, index):
+        events = self.events
+        while len(events) <= index:
+            events.append(next(self._timeline))
+        return events[index]
+
+    def due(self, deci):
+        """Returns the events due at deci and moves past them, the events a frame skipped over are late but still
+        handed out"""
+        if self._event(self.index).deci > deci:
+            return ()
+        due = []
+        while self._event(self.index).deci <= deci:
+            due.append(self.events[self.index])
+            self.index += 1
+        return due
+
+    def skip_to(self, deci):
+        """Moves past the events due before deci without handing them out, for a game started in the past"""
+        while self._event(self.index).deci < deci:
+            self.index += 1
+
+    def lookahead(self, deci, window, kinds=OBSTACLES):
+        """Returns the events of the given kinds still to come and due within window deciseconds of deci"""
+        upcoming = []
+        index = self.index
+        while True:
+            event = self._event(index)
+            if event.deci > deci + window:
+                return upcoming
+            if event.kind in kinds:
+                upcoming.append(event)
+            index += 1
+
+    def get_state(self):
+        return self.seed, self.index
+
+    def set_state(self, state):
+        seed, index = state
+        # the events already generated stay valid for every state of the same seed
+        if seed != self.seed:
+            self.reset(seed)
+        self.index = index
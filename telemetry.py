@@ -0,0 +1,337 @@
+"""Opt-in telemetry of the played sessions, for comparing how the game performs on many machines
+
+The front end counts the frames, the spawns, the collision checks and the bullets in a few ints and a preallocated
+histogram of frame times, once a minute and when the game is closed they are handed as a record to a background
+thread which encodes it as a line of JSON. The file is rotated once it grows past a size, like the logging
+RotatingFileHandler, telemetry.jsonl, telemetry.jsonl.1, ... Every minute record holds the counts of that minute only,
+so the aggregator can add the records of any number of files and sessions together, a session which crashed still
+has its minutes:
+
+    python telemetry.py telemetry.jsonl* cabinets/*.jsonl    # summary tables of the records
+    python telemetry.py logs/ --by session
+"""
+import argparse
+import glob
+import json
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+import uuid
+
+import collision
+
+VERSION = 1
+# frame times are counted in buckets of BUCKET_MS, the last bucket also counts every longer frame
+BUCKET_MS = 0.5
+BUCKETS = 500
+# at most this many frame time outliers are listed in a minute record, they are all counted
+MAX_OUTLIERS = 20
+
+
+def histogram_percentile(histogram, fraction):
+    """Returns the nearest-rank percentile in millis of a {bucket: count} frame time histogram, the middle of its
+    bucket"""
+    total = sum(histogram.values())
+    if not total:
+        return 0.0
+    rank = min(int(fraction * total), total - 1)
+    for bucket in sorted(histogram):
+        rank -= histogram[bucket]
+        if rank < 0:
+            return (bucket + 0.5) * BUCKET_MS
+    return 0.0
+
+
+def frame_summary(histogram):
+    return {name: round(histogram_percentile(histogram, fraction), 2)
+            for name, fraction in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))}
+
+
+class NullTelemetry:
+    """Telemetry used when it is disabled, every call does nothing and the collision checks are plain mask tests"""
+
+    collided = staticmethod(collision.mask_hit)
+
+    def spawned(self, event):
+        pass
+
+    def fired(self):
+        pass
+
+    def bullet_hit(self):
+        pass
+
+
+class JsonLinesWriter:
+    """Writes records to a JSON Lines file from a background thread, the caller only puts them on a queue
+
+    Lines are buffered and flushed once the queue is empty. Before a line would grow the file past max_bytes the file
+    is renamed to path.1, the older files shift up to path.<backups> and the oldest is removed"""
+
+    def __init__(self, path, max_bytes=1000000, backups=5):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.records = queue.SimpleQueue()
+        self.file = open(path, "a")
+        self.writer = threading.Thread(target=self._write_loop, name="telemetry-writer", daemon=True)
+        self.writer.start()
+
+    def write(self, record):
+        self.records.put(record)
+
+    def close(self):
+        """Writing the records left and stopping the writer"""
+        self.records.put(None)
+        self.writer.join()
+        self.file.close()
+
+    def _rotate(self):
+        self.file.close()
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.file = open(self.path, "a")
+
+    def _write_loop(self):
+        while True:
+            record = self.records.get()
+            if record is None:
+                return
+            line = json.dumps(record, separators=(",", ":")) + "\n"
+            if self.file.tell() and self.file.tell() + len(line) > self.max_bytes:
+                self._rotate()
+            self.file.write(line)
+            if self.records.empty():
+                self.file.flush()
+
+
+class SessionTelemetry:
+    """Counts what the engine and the front end report and writes a minute record every interval seconds, and a
+    session record with the totals when it is closed
+
+    A frame is timed from the end of the previous one, so the frame times are the achieved frame rate, a frame longer
+    than two frame budgets of fps is an outlier. The collision checks are the mask tests, one per pair of sprites whose
+    rects overlap and more along the way of the fast ones"""
+
+    def __init__(self, writer, settings, seed, interval=60):
+        self.writer = writer
+        self.interval = interval
+        self.outlier_ms = 2000 / settings.fps
+        self.session = uuid.uuid4().hex[:12]
+        self.machine = socket.gethostname()
+        self.seed = seed
+        self.started_at = time.time()
+        self.minute = 0
+        self.last_frame = None
+        self.minute_start = self.next_flush = None
+        self.totals = self._counts()
+        self.games_played = 0
+        self.best_score = 0
+        self.best_level = 0
+        self._start_minute()
+        writer.write(self._record("start", fps=settings.fps, tick_rate=settings.tick_rate,
+                                  render_scale=settings.render_scale, screen=settings.screen_dimen))
+
+    def _counts(self):
+        return {"frames": 0, "histogram": [0] * BUCKETS, "outliers": 0, "spawns": {"cactus": 0, "bird": 0},
+                "collision_checks": 0, "bullets_fired": 0, "bullets_hit": 0}
+
+    def _start_minute(self):
+        counts = self._counts()
+        self.histogram = counts["histogram"]
+        self.spawns = counts["spawns"]
+        self.frames = self.outliers = self.collision_checks = self.bullets_fired = self.bullets_hit = 0
+        self.outlier_frames = []
+        self.games = []
+
+    def _record(self, kind, **fields):
+        record = {"type": kind, "v": VERSION, "session": self.session, "machine": self.machine, "time": time.time()}
+        record.update(fields)
+        return record
+
+    def collided(self, sprite, other, offset):
+        self.collision_checks += 1
+        return collision.mask_hit(sprite, other, offset)
+
+    def spawned(self, event):
+        if event.kind == "cacti":
+            self.spawns["cactus"] += len(event.params)
+        elif event.kind == "bird":
+            self.spawns["bird"] += 1
+
+    def fired(self):
+        self.bullets_fired += 1
+
+    def bullet_hit(self):
+        self.bullets_hit += 1
+
+    def game_over(self, engine):
+        level = engine.current_mile_stone // 100
+        self.games.append({"score": engine.score, "kills": engine.kills, "cause_of_death": engine.cause_of_death,
+                           "level": level})
+        self.games_played += 1
+        self.best_score = max(self.best_score, engine.score)
+        self.best_level = max(self.best_level, level)
+
+    def end_frame(self):
+        """Called once per displayed frame, it only counts, the records are built once per interval"""
+        now = time.perf_counter()
+        if self.last_frame is None:
+            self.last_frame = self.minute_start = now
+            self.next_flush = now + self.interval
+            return
+        frame_ms = (now - self.last_frame) * 1000
+        self.last_frame = now
+        self.histogram[min(int(frame_ms / BUCKET_MS), BUCKETS - 1)] += 1
+        self.frames += 1
+        if frame_ms > self.outlier_ms:
+            self.outliers += 1
+            if len(self.outlier_frames) < MAX_OUTLIERS:
+                self.outlier_frames.append((self.totals["frames"] + self.frames, round(frame_ms, 2)))
+        if now >= self.next_flush:
+            self._flush_minute(now)
+
+    def _flush_minute(self, now):
+        seconds = now - self.minute_start
+        histogram = {i: count for i, count in enumerate(self.histogram) if count}
+        totals = self.totals
+        totals["frames"] += self.frames
+        for i, count in histogram.items():
+            totals["histogram"][i] += count
+        totals["outliers"] += self.outliers
+        for kind, count in self.spawns.items():
+            totals["spawns"][kind] += count
+        totals["collision_checks"] += self.collision_checks
+        totals["bullets_fired"] += self.bullets_fired
+        totals["bullets_hit"] += self.bullets_hit
+        self.writer.write(self._record(
+            "minute", minute=self.minute, seconds=round(seconds, 3), frames=self.frames,
+            fps=round(self.frames / seconds, 2) if seconds else 0.0, frame_ms=frame_summary(histogram),
+            frame_ms_histogram=histogram, outliers=self.outliers, outlier_frames=self.outlier_frames,
+            spawns=self.spawns, collision_checks=self.collision_checks,
+            collision_checks_per_frame=round(self.collision_checks / max(self.frames, 1), 3),
+            bullets_fired=self.bullets_fired, bullets_hit=self.bullets_hit, games=self.games,
+            best_score=self.best_score, best_level=self.best_level))
+        self.minute += 1
+        self._start_minute()
+        self.minute_start = now
+        self.next_flush = now + self.interval
+
+    def close(self):
+        """Writing the last, partial, minute and the session record and stopping the writer"""
+        if self.last_frame is not None:
+            self._flush_minute(time.perf_counter())
+        totals = self.totals
+        histogram = {i: count for i, count in enumerate(totals["histogram"]) if count}
+        seconds = time.time() - self.started_at
+        self.writer.write(self._record(
+            "session", seed=self.seed, seconds=round(seconds, 3), minutes=self.minute, frames=totals["frames"],
+            frame_ms=frame_summary(histogram), frame_ms_histogram=histogram, outliers=totals["outliers"],
+            spawns=totals["spawns"], collision_checks=totals["collision_checks"],
+            bullets_fired=totals["bullets_fired"], bullets_hit=totals["bullets_hit"], games=self.games_played,
+            best_score=self.best_score, best_level=self.best_level))
+        self.writer.close()
+
+
+def read_records(paths):
+    """Yields the records of the given files, directories are searched for *.jsonl* files, lines which are not
+    JSON, like the last line of a file being written when the game crashed, are skipped"""
+    for path in paths:
+        if os.path.isdir(path):
+            yield from read_records(sorted(glob.glob(os.path.join(path, "*.jsonl*"))))
+            continue
+        with open(path) as file:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def _group():
+    return {"sessions": set(), "closed": 0, "seconds": 0.0, "frames": 0, "histogram": {}, "outliers": 0,
+            "cactus": 0, "bird": 0, "collision_checks": 0, "fired": 0, "hit": 0, "scores": [], "level": 0,
+            "deaths": {}}
+
+
+def aggregate(records, by="machine"):
+    """Adds the minute records together per machine or per session, returns {key: totals}"""
+    groups = {}
+    for record in records:
+        if record.get("v") != VERSION:
+            continue
+        group = groups.setdefault(record[by], _group())
+        group["sessions"].add(record["session"])
+        if record["type"] == "session":
+            group["closed"] += 1
+        if record["type"] != "minute":
+            continue
+        group["seconds"] += record["seconds"]
+        group["frames"] += record["frames"]
+        for bucket, count in record["frame_ms_histogram"].items():
+            # json keys are strings
+            group["histogram"][int(bucket)] = group["histogram"].get(int(bucket), 0) + count
+        group["outliers"] += record["outliers"]
+        group["cactus"] += record["spawns"]["cactus"]
+        group["bird"] += record["spawns"]["bird"]
+        group["collision_checks"] += record["collision_checks"]
+        group["fired"] += record["bullets_fired"]
+        group["hit"] += record["bullets_hit"]
+        for game in record["games"]:
+            group["scores"].append(game["score"])
+            group["level"] = max(group["level"], game["level"])
+            cause = game["cause_of_death"] or "none"
+            group["deaths"][cause] = group["deaths"].get(cause, 0) + 1
+    return groups
+
+
+def summary_tables(groups):
+    """Returns the performance and the gameplay tables of aggregate as printable lines"""
+    performance = [f"{'':14} {'sessions':>8} {'closed':>6} {'hours':>7} {'fps':>7} {'p50 ms':>7} {'p95 ms':>7} "
+                   f"{'p99 ms':>7} {'outl/1k':>7} {'checks/f':>8}"]
+    gameplay = [f"{'':14} {'games':>6} {'best':>6} {'mean':>8} {'level':>5} {'cacti/m':>7} {'birds/m':>7} "
+                f"{'fired':>7} {'hit %':>6}  deaths"]
+    for key, group in sorted(groups.items()):
+        frames = max(group["frames"], 1)
+        minutes = max(group["seconds"] / 60, 1e-9)
+        summary = frame_summary(group["histogram"])
+        fps = group["frames"] / group["seconds"] if group["seconds"] else 0.0
+        performance.append(
+            f"{str(key)[:14]:14} {len(group['sessions']):8} {group['closed']:6} {group['seconds'] / 3600:7.2f} "
+            f"{fps:7.1f} {summary['p50']:7.2f} {summary['p95']:7.2f} {summary['p99']:7.2f} "
+            f"{group['outliers'] * 1000 / frames:7.2f} {group['collision_checks'] / frames:8.3f}")
+        scores = group["scores"]
+        mean = sum(scores) / len(scores) if scores else 0.0
+        hit = group["hit"] * 100 / group["fired"] if group["fired"] else 0.0
+        deaths = " ".join(f"{cause} {count}" for cause, count in sorted(group["deaths"].items()))
+        gameplay.append(
+            f"{str(key)[:14]:14} {len(scores):6} {max(scores, default=0):6} {mean:8.1f} {group['level']:5} "
+            f"{group['cactus'] / minutes:7.1f} {group['bird'] / minutes:7.1f} {group['fired']:7} {hit:6.1f}  "
+            f"{deaths}")
+    return ["performance"] + performance + ["", "gameplay"] + gameplay
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Merges telemetry files into summary tables")
+    parser.add_argument("paths", nargs="+", help="telemetry files or directories holding them")
+    parser.add_argument("--by", choices=("machine", "session"), default="machine", help="rows of the tables")
+    args = parser.parse_args(args)
+
+    groups = aggregate(read_records(args.paths), args.by)
+    if not groups:
+        print("no telemetry records")
+        return 1
+    print("\n".join(summary_tables(groups)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
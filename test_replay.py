@@ -0,0 +1,51 @@
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+from engine import SimulatedClock, TRexEngine
+from replay import Session, SessionRecorder, replay, verify
+
+
+def record(seed, frames, inputs):
+    """Plays a headless game the way TRexRunner.start_game does while recording it, inputs maps the number of frames
+    played to the keys pressed after them"""
+    clock = SimulatedClock()
+    engine = TRexEngine(clock=clock)
+    recorder = SessionRecorder(seed, clock.get_ticks())
+    engine.reset(seed)
+    for frame in range(frames + 1):
+        for key in inputs.get(frame, ()):
+            recorder.record_input(pygame.KEYDOWN, key)
+            engine.handle_input(pygame.KEYDOWN, key)
+        if frame == frames:
+            break
+        clock.advance()
+        recorder.record_frame(clock.get_ticks())
+        engine.update()
+    return recorder, engine
+
+
+def test_input_before_the_first_frame(tmp_path):
+    # the key starting the game is read before the first tick of the front end
+    recorder, engine = record(7, 600, {0: [pygame.K_a], 200: [pygame.K_UP], 400: [pygame.K_UP]})
+    assert engine.started
+    assert list(recorder.session.inputs[:3]) == [0, pygame.KEYDOWN, pygame.K_a]
+    path = str(tmp_path / "session.trex")
+    recorder.save(path, engine)
+    session = Session.load(path)
+    replayed = replay(session)
+    assert replayed.started
+    assert replayed.score == engine.score > 0
+    assert verify(session, replayed)
+
+
+def test_inputs_after_the_last_frame(tmp_path):
+    recorder, engine = record(11, 300, {0: [pygame.K_a], 300: [pygame.K_UP]})
+    path = str(tmp_path / "session.trex")
+    recorder.save(path, engine)
+    replayed = replay(Session.load(path))
+    assert replayed.trex.jumping == engine.trex.jumping
+    assert verify(recorder.session, replayed)
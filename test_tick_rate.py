@@ -0,0 +1,41 @@
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pytest
+
+from engine import TRexEngine
+from settings import Settings
+from trex_game_sprites import Bird, Cactus
+
+RATES = (60, 120, 144)
+
+
+def distances(tick_rate, seconds=1):
+    """Returns how many pixels a cactus, a bird, a cloud and the ground move during seconds at the tick rate"""
+    settings = Settings()
+    settings.tick_rate = tick_rate
+    settings.reset_difficulty()
+    engine = TRexEngine(settings=settings)
+    cactus = Cactus(engine, engine.ground.floor_y, 0, 3)
+    bird = Bird(engine, (100, 100, 100), 0)
+    engine.clouds.clear()
+    engine.clouds.add(0, 800, 50)
+    starts = cactus.rect.x, bird.rect.x, engine.clouds.left[0]
+    scrolled = 0
+    for _ in range(tick_rate * seconds):
+        cactus.update()
+        bird.update()
+        engine.clouds.update(settings.cloud_velocity)
+        offset = engine.ground.offset
+        engine.ground.update(settings.ground_velocity)
+        scrolled += (engine.ground.offset - offset) % engine.ground.period
+    return (starts[0] - cactus.rect.x, starts[1] - bird.rect.x, starts[2] - engine.clouds.left[0], round(scrolled))
+
+
+@pytest.mark.parametrize("tick_rate", RATES[1:])
+def test_same_speed_at_any_tick_rate(tick_rate):
+    cactus, bird, cloud, ground = distances(60)
+    assert (cactus, bird, cloud, ground) == (780, 480, 60, 780)
+    assert distances(tick_rate) == pytest.approx((cactus, bird, cloud, ground), abs=1)
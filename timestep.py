@@ -0,0 +1,59 @@
+class FixedTimestep:
+    """Turns the real time elapsed between drawn frames into a whole number of simulation ticks
+
+    The game always moves by ticks of the same length, a slow host runs several ticks before drawing a frame and a fast
+    one draws frames without running any tick. The time left over, less than a tick, is given as alpha so the drawn
+    frame can be placed between the last two ticks"""
+
+    def __init__(self, tick_rate, max_ticks_per_frame):
+        self.tick_time = 1000 / tick_rate
+        # past this many ticks per frame the host cannot even keep up with the simulation, the late time is dropped
+        # instead of spiralling into longer and longer frames
+        self.max_ticks_per_frame = max_ticks_per_frame
+        self.accumulator = 0.0
+        self.last_ticks = None
+
+    def advance(self, ticks):
+        """Adding the real time up to ticks and returning how many simulation ticks are due"""
+        if self.last_ticks is None:
+            self.last_ticks = ticks
+        self.accumulator += ticks - self.last_ticks
+        self.last_ticks = ticks
+        count = int(self.accumulator // self.tick_time)
+        if count > self.max_ticks_per_frame:
+            count = self.max_ticks_per_frame
+            self.accumulator %= self.tick_time
+        else:
+            self.accumulator -= count * self.tick_time
+        return count
+
+    def alpha(self):
+        """Returns how far the real time is between the last tick and the next one, from 0 to 1"""
+        return self.accumulator / self.tick_time
+
+
+class Interpolator:
+    """Draws sprites between where they were before the last tick and where they are now"""
+
+    def __init__(self, max_distance):
+        # a sprite which moved farther than this in one tick was placed again, a pooled sprite coming back or a new
+        # game, it is drawn where it is
+        self.max_distance = max_distance
+        self.previous = {}
+
+    def snapshot(self, groups):
+        """Keeping the positions of the sprites before a tick"""
+        self.previous = {sprite: sprite.rect.topleft for group in groups for sprite in group}
+
+    def draw(self, screen, group, alpha):
+        previous = self.previous
+        for sprite in group:
+            x, y = sprite.rect.topleft
+            position = previous.get(sprite)
+            if position is not None:
+                dx = x - position[0]
+                dy = y - position[1]
+                if abs(dx) <= self.max_distance and abs(dy) <= self.max_distance:
+                    x = position[0] + dx * alpha
+                    y = position[1] + dy * alpha
+            screen.blit(sprite.image, (x, y))
@@ -1,8 +1,12 @@
-import random
-
 import pygame
 
 
+def jump_height(count):
+    """Returns how far the trex moves between a jump count of 0 and count, the sum of count ** 2 / 4 over the counts
+    down to 1, it also takes the counts between two integers so the jump reaches the same height at any tick rate"""
+    return count * (count + 1) * (2 * count + 1) / 24
+
+
 class Animated(pygame.sprite.Sprite):
     """Parent class for characters which are consisted of more than one image"""
 
@@ -28,6 +32,7 @@ class TRex(Animated):
 
     def __init__(self, t_game, y):
         self.settings = t_game.settings
+        self.assets = t_game.assets
         self.screen = t_game.screen
         self.screen_rect = self.screen.get_rect()
         # init walking images
@@ -36,17 +41,19 @@ class TRex(Animated):
         # calling super animated init
         super(TRex, self).__init__(self.trex_walking_sprites)
         # setting the trex velocity by calling the parent class set_vel
-        self.set_vel(self.settings.character_animation_velocity)
+        self.set_vel(self.settings.per_tick(self.settings.character_animation_velocity))
         # init crouching images
         self.trex_crouching_sprites = []
         self._init_crouching()
         # init jumping image
-        self.jump_image = pygame.image.load("assets/t-rex/t-rex-0.png").convert_alpha()
-        self.collision_image = pygame.image.load("assets/t-rex/t-rex-4.png").convert_alpha()
+        self.jump_image = self.assets.image("t-rex/t-rex-0")
+        self.collision_image = self.assets.image("t-rex/t-rex-4")
+        # every image the trex can show, a snapshot stores the index of the current one
+        self.images = self.trex_walking_sprites + self.trex_crouching_sprites + [self.jump_image, self.collision_image]
 
         # setting current image to start with the jump image
         self.image = self.jump_image
-        self.mask = pygame.mask.from_surface(self.image)
+        self.mask = self.assets.mask("t-rex/t-rex-0")
         self.rect = self.image.get_rect()
         self.rect.center = (self.rect.width, self.rect.height)
         self.y = y
@@ -56,9 +63,12 @@ class TRex(Animated):
         self.jumping = False
         self.crouching = False
         self.collided = False
+        # how far the trex moved down during the last update, the collision checks sweep the obstacles along it
+        self.dy = 0
 
     def update(self):
         """Sets the current trex image according to trex condition (crouching, jumping, walking)"""
+        y = self.rect.y
         self._set_y()
         if not self.jumping and not self.crouching:
             if self.current_list != self.trex_walking_sprites:
@@ -71,6 +81,7 @@ class TRex(Animated):
             if self.current_list != self.trex_crouching_sprites:
                 self.current_list = self.trex_crouching_sprites
             self._animate_through()
+        self.dy = self.rect.y - y
 
     def _set_y(self):
         """Sets the y-axis of the trex according to current condition (crouching, jumping, walking)"""
@@ -80,12 +91,12 @@ class TRex(Animated):
             self.rect.y = self.y - self.rect.height * 0.12
 
     def _init_walk(self):
-        self.trex_walking_sprites.append(pygame.image.load("assets/t-rex/t-rex-1.png").convert_alpha())
-        self.trex_walking_sprites.append(pygame.image.load("assets/t-rex/t-rex-2.png").convert_alpha())
+        self.trex_walking_sprites.append(self.assets.image("t-rex/t-rex-1"))
+        self.trex_walking_sprites.append(self.assets.image("t-rex/t-rex-2"))
 
     def _init_crouching(self):
-        self.trex_crouching_sprites.append(pygame.image.load("assets/t-rex/t-rex-5.png").convert_alpha())
-        self.trex_crouching_sprites.append(pygame.image.load("assets/t-rex/t-rex-6.png").convert_alpha())
+        self.trex_crouching_sprites.append(self.assets.image("t-rex/t-rex-5"))
+        self.trex_crouching_sprites.append(self.assets.image("t-rex/t-rex-6"))
 
     def _jump(self):
         y = self.rect.y
@@ -96,9 +107,13 @@ class TRex(Animated):
             status = 1
             if self.jump_count < 0:
                 status = -1
-            y -= ((self.jump_count ** 2) * 0.5 * status) / 2
+            # the jump count goes down by the same amount per second whatever the tick rate, see Settings.per_tick, and
+            # the trex moves by the part of the jump between the counts
+            step = self.settings.per_tick(1)
+            count = abs(self.jump_count)
+            y -= (jump_height(count) - jump_height(count - step)) * status
             self.rect.y = y
-            self.jump_count -= 1
+            self.jump_count -= step
         else:
             self.jumping = False
             self.jump_count = self.settings.jump_count
@@ -111,82 +126,67 @@ class TRex(Animated):
             self.rect.y = self.y - self.rect.height * 0.5
         self.image = self.collision_image
 
+    def get_state(self):
+        """Returns the state of the trex as a tuple of plain values, see TRexEngine.snapshot"""
+        return (self.rect.y, self.jump_count, self.jumping, self.crouching, self.collided, self.current_sprite_index,
+                self.current_list is self.trex_crouching_sprites, self.images.index(self.image))
+
+    def set_state(self, state):
+        (self.rect.y, self.jump_count, self.jumping, self.crouching, self.collided, self.current_sprite_index,
+         crouching_list, image) = state
+        self.current_list = self.trex_crouching_sprites if crouching_list else self.trex_walking_sprites
+        self.image = self.images[image]
+
     def reset(self):
         self.jump_count = self.settings.jump_count
         self.jumping = False
         self.crouching = False
         self.collided = False
+        # back to the first image and the standing position, so a new game does not depend on the previous one
+        self.current_sprite_index = 0
+        self.current_list = self.trex_walking_sprites
+        self.image = self.jump_image
+        self.rect.y = self.y - self.rect.height * 0.5
+        self.dy = 0
 
 
-class Ground(pygame.sprite.Sprite):
-    """Building Ground sprite"""
-
-    def __init__(self, t_game):
-        super(Ground, self).__init__()
-        self.image = pygame.image.load("assets/ground/ground.png").convert_alpha()
-        self.rect = self.image.get_rect()
-        self.settings = t_game.settings
-        self.screen = t_game.screen
-        self.screen_rect = self.screen.get_rect()
-        self.rect.y = self.screen_rect.height * 0.75
-
-    def should_attach_another_ground(self):
-        """Determining whether we want to add another ground by checking if the right of the current ground is less or
-        equal to screen right"""
-        return self.rect.right <= self.screen_rect.right
-
-    def set_left(self, right):
-        """Setting the left of the current ground according to the right of the old ground"""
-        self.rect.left = right - 15
-
-    def update(self):
-        self._check_kill()
-        self.rect.x -= self.settings.ground_velocity
-
-    def _check_kill(self):
-        """Killing the sprite if it is beyond the screen"""
-        if self.rect.right <= self.screen_rect.left:
-            self.kill()
+class Pooled(pygame.sprite.Sprite):
+    """Parent class for sprites which are reused through a SpritePool, a killed sprite goes back to its pool and
+    reinit places it again as if it was just created"""
 
+    pool = None
+    in_pool = False
 
-class Cloud(pygame.sprite.Sprite):
-    """Building Ground sprite"""
+    def kill(self):
+        super().kill()
+        if self.pool is not None:
+            self.pool.release(self)
 
-    def __init__(self, t_game, extra_x=0):
-        super(Cloud, self).__init__()
-        self.image = pygame.image.load("assets/cloud/cloud.png").convert_alpha()
-        self.rect = self.image.get_rect()
-        self.settings = t_game.settings
-        self.screen = t_game.screen
-        self.screen_rect = self.screen.get_rect()
-        x = self.screen_rect.width + self.rect.width + extra_x
-        y = random.randrange(self.screen_rect.height * .40, self.screen_rect.height * .65)
-        self.rect.center = (x, y)
+    def reinit(self, *args):
+        pass
 
-    def update(self):
-        self.rect.x -= self.settings.cloud_velocity
-        self._check_kill()
+    def get_state(self):
+        """Returns the state of the sprite as a tuple of plain values, see TRexEngine.snapshot"""
+        return self.rect.topleft
 
-    def _check_kill(self):
-        """Killing the sprite if it is beyond the screen"""
-        if self.rect.right <= self.screen_rect.left:
-            self.kill()
+    def set_state(self, state):
+        self.rect.topleft = state
 
 
-class Cactus(pygame.sprite.Sprite):
+class Cactus(Pooled):
     """Building Cactus sprite"""
 
-    def __init__(self, t_game, extra_y, current_x):
+    def __init__(self, t_game, extra_y=0, current_x=0, cactus_id=0):
         super(Cactus, self).__init__()
-        self.id = random.randrange(13)
-        cactus_file = f"assets/cactus/cactus-{self.id}.png"
-        cactus_damage_file = f"assets/cactus/cactus-{self.id}-shot.png"
-        self.image = pygame.image.load(cactus_file).convert_alpha()
-        self.damaged_image = pygame.image.load(cactus_damage_file).convert_alpha()
-        self.rect = self.image.get_rect()
+        self.assets = t_game.assets
         self.screen = t_game.screen
         self.screen_rect = self.screen.get_rect()
         self.settings = t_game.settings
+        self.rect = pygame.Rect(0, 0, 0, 0)
+        self.reinit(extra_y, current_x, cactus_id)
+
+    def reinit(self, extra_y, current_x, cactus_id):
+        self._set_id(cactus_id)
         # if current_x was not 0 then we have a previous cactus created,
         # and therefore we will place the current cactus to right of the old cactus
         # and spacing them with some void
@@ -196,10 +196,30 @@ class Cactus(pygame.sprite.Sprite):
             x = self.screen_rect.width
         y = extra_y - self.rect.height / 3
         self.rect.center = (x, y)
-        self.mask = pygame.mask.from_surface(self.image)
+        # the left edge keeps the fractions of a pixel the cactus moves by, the rect is rounded from it
+        self.x = self.rect.x
+
+    def _set_id(self, cactus_id):
+        self.id = cactus_id
+        cactus_name = f"cactus/cactus-{self.id}"
+        self.image = self.assets.image(cactus_name)
+        self.damaged_image = self.assets.image(f"{cactus_name}-shot")
+        self.rect.size = self.image.get_size()
+        self.mask = self.assets.mask(cactus_name)
+
+    def get_state(self):
+        return self.id, self.x, self.rect.y, self.image is self.damaged_image
+
+    def set_state(self, state):
+        cactus_id, self.x, y, damaged = state
+        if cactus_id != self.id:
+            self._set_id(cactus_id)
+        self.rect.topleft = (self.x, y)
+        self.image = self.damaged_image if damaged else self.assets.image(f"cactus/cactus-{self.id}")
 
     def update(self):
-        self.rect.x -= self.settings.ground_velocity
+        self.x -= self.settings.ground_velocity
+        self.rect.x = self.x
         self._check_kill()
 
     def set_damaged(self):
@@ -207,80 +227,73 @@ class Cactus(pygame.sprite.Sprite):
         self.image = self.damaged_image
 
     def _check_kill(self):
-        """Killing the sprite if it is beyond the screen"""
-        if self.rect.right <= self.screen_rect.left:
+        """Killing the sprite if it is beyond the screen, and was already at the previous collision check which has
+        yet to sweep it along its last move"""
+        if self.rect.right + self.settings.ground_velocity <= self.screen_rect.left:
             self.kill()
 
 
-class Star(pygame.sprite.Sprite):
-    """Building Star sprite"""
-
-    def __init__(self, t_game, extra_x):
-        super(Star, self).__init__()
-        star_file = f"assets/star/star-{random.randrange(1, 4)}.png"
-        self.image = pygame.image.load(star_file).convert_alpha()
-        self.rect = self.image.get_rect()
-        self.settings = t_game.settings
-        self.screen = t_game.screen
-        self.screen_rect = self.screen.get_rect()
-        self.x = float(self.screen_rect.width + self.rect.width + extra_x)
-        self.y = float(random.randrange(self.screen_rect.height * .45, self.screen_rect.height * .60))
-        self.rect.center = (self.x, self.y)
-
-    def update(self):
-        self.x -= self.settings.star_velocity
-        self.rect.center = (self.x, self.y)
-        self._check_kill()
-
-    def _check_kill(self):
-        """Killing the sprite if it is beyond the screen"""
-        if self.rect.right < 0:
-            self.kill()
-
-
-class Bird(Animated):
+class Bird(Animated, Pooled):
     """Building Bird sprite"""
 
-    def __init__(self, t_game, list_of_ys):
+    def __init__(self, t_game, list_of_ys=(0, 0, 0), lane=0):
         self.screen = t_game.screen
         self.screen_rect = t_game.screen_rect
         self.settings = t_game.settings
-        self.bird_sprites = [pygame.image.load("assets/bird/bird-1.png"), pygame.image.load("assets/bird/bird-2.png")]
-        self.damaged_bird_sprites = [pygame.image.load("assets/bird/bird-1-shot.png"),
-                                     pygame.image.load("assets/bird/bird-2-shot.png")]
+        assets = t_game.assets
+        self.bird_sprites = [assets.image("bird/bird-1"), assets.image("bird/bird-2")]
+        self.damaged_bird_sprites = [assets.image("bird/bird-1-shot"), assets.image("bird/bird-2-shot")]
         # calling super animated init
         super().__init__(self.bird_sprites)
         # setting the bird velocity by calling the parent class set_vel
-        self.set_vel(self.settings.bird_animation_velocity)
+        self.set_vel(self.settings.per_tick(self.settings.bird_animation_velocity))
         self.image = self.bird_sprites[self.current_sprite_index]
         self.rect = self.image.get_rect()
         # used for circle collision
         self.radius = self.rect.width * 0.3
-        # generating random number between the list of y length
+        self.mask = assets.mask("bird/bird-1")
+        self.reinit(list_of_ys, lane)
+
+    def reinit(self, list_of_ys, lane):
+        self.current_sprite_index = 0
+        self.current_list = self.bird_sprites
+        self.image = self.bird_sprites[self.current_sprite_index]
+        # the lane picks one of the list of ys
         # as 0 is top, 1 is bottom
         # in order to place the y of the bird correctly
-        # so if index == 0 we place top of bird to top of trex with some space (bird height halved)
-        # and if index == 1 bottom of bird is bottom of trex
-        index = random.randrange(0, len(list_of_ys))
+        # so if lane == 0 we place top of bird to top of trex with some space (bird height halved)
+        # and if lane == 1 bottom of bird is bottom of trex
         self.y = 0
-        if index == 0:
+        if lane == 0:
             self.rect.top = list_of_ys[0]
-        elif index == 1:
+        elif lane == 1:
             self.rect.bottom = list_of_ys[1]
         else:
             self.rect.top = list_of_ys[2]
 
         self.rect.x = self.screen_rect.width
-        self.mask = pygame.mask.from_surface(self.image)
+        # the left edge keeps the fractions of a pixel, see Cactus
+        self.x = self.rect.x
+
+    def get_state(self):
+        return self.x, self.rect.y, self.current_sprite_index, self.current_list is self.damaged_bird_sprites
+
+    def set_state(self, state):
+        self.x, y, self.current_sprite_index, damaged = state
+        self.rect.topleft = (self.x, y)
+        self.current_list = self.damaged_bird_sprites if damaged else self.bird_sprites
+        self.image = self.current_list[int(self.current_sprite_index)]
 
     def update(self):
         self._animate_through()
-        self.rect.x -= self.settings.bird_velocity
+        self.x -= self.settings.bird_velocity
+        self.rect.x = self.x
         self._check_kill()
 
     def _check_kill(self):
-        """Killing the sprite if it is beyond the screen"""
-        if self.rect.right < 0:
+        """Killing the sprite if it is beyond the screen, and was already at the previous collision check, see
+        Cactus"""
+        if self.rect.right + self.settings.bird_velocity < 0:
             self.kill()
 
     def set_damaged(self):
@@ -288,34 +301,7 @@ class Bird(Animated):
         self.current_list = self.damaged_bird_sprites
 
 
-class Moon(pygame.sprite.Sprite):
-    """Building Moon sprite"""
-
-    def __init__(self, t_game):
-        super().__init__()
-        # generating random number to pic a random image from the moon assets
-        i = random.randint(0, 6)
-        self.image = pygame.image.load(f"assets/moon/moon-{i}.png")
-        self.rect = self.image.get_rect()
-        self.settings = t_game.settings
-        self.screen = t_game.screen
-        self.screen_rect = self.screen.get_rect()
-        self.x = self.screen_rect.width
-        self.y = self.screen_rect.height * .45
-        self.rect.center = (self.x, self.y)
-
-    def update(self):
-        self.x -= self.settings.moon_velocity
-        self.rect.center = (self.x, self.y)
-        self._check_kill()
-
-    def _check_kill(self):
-        """Killing the sprite if it is beyond the screen"""
-        if self.rect.right < 0:
-            self.kill()
-
-
-class Bullet(pygame.sprite.Sprite):
+class Bullet(Pooled):
     """Building Bullet sprite"""
 
     def __init__(self, t_game):
@@ -323,17 +309,29 @@ class Bullet(pygame.sprite.Sprite):
         self.screen = t_game.screen
         self.screen_rect = t_game.screen.get_rect()
         self.settings = t_game.settings
-        self.left = t_game.trex.rect.right
-        # placing the bullet just in front of the trex gun which is equivalent to 4361 percent of the height of the trex
-        self.top = t_game.trex.rect.top + t_game.trex.rect.height * 0.4361
+        self.trex = t_game.trex
         self.image = pygame.surface.Surface((self.settings.bullet_width, self.settings.bullet_height))
         self.image.fill(self.settings.items_color)
         self.rect = self.image.get_rect()
+        self.mask = pygame.mask.Mask(self.rect.size, fill=True)
+        self.reinit()
+
+    def reinit(self):
+        self.left = self.trex.rect.right
+        # placing the bullet just in front of the trex gun which is equivalent to 4361 percent of the height of the trex
+        self.top = self.trex.rect.top + self.trex.rect.height * 0.4361
         self.rect.top = self.top
         self.rect.left = self.left
 
+    def get_state(self):
+        return self.left, self.top, self.rect.x, self.rect.y
+
+    def set_state(self, state):
+        self.left, self.top, x, y = state
+        self.rect.topleft = (x, y)
+
     def update(self):
-        self.left += self.settings.bullet_speed
+        self.left += self.settings.per_tick(self.settings.bullet_speed)
         self.rect.center = (self.left, self.top)
         self._check_kill()
 
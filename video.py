@@ -0,0 +1,154 @@
+"""Recording the displayed frames of the game
+
+The front end copies every displayed frame into one of a few preallocated surfaces and a background thread encodes it,
+so recording costs the frame loop a single blit. When the writer falls behind and no surface is free the frame is
+dropped and counted instead of stalling the game. Frames are written as a png sequence in a directory or to a .trxv
+file of raw or zlib compressed RGB frames, each with its frame number and time so the dropped frames show as gaps:
+
+    python video.py recording.trxv --frames-dir frames    # export a .trxv recording to png files
+"""
+import argparse
+import os
+import queue
+import struct
+import sys
+import threading
+import zlib
+
+import pygame
+
+MAGIC = b"TRXV"
+VERSION = 1
+CODECS = ("raw", "zlib", "png")
+# magic, version, codec index, width, height
+HEADER = struct.Struct("<4sBBHH")
+# frame number, millis since the first frame, payload length
+FRAME = struct.Struct("<III")
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def _png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def encode_png(rgb, width, height, level=1):
+    """Returns a png file of RGB bytes, zlib compresses without holding the GIL unlike pygame.image.save, so the
+    writer thread does not slow the frame loop down"""
+    stride = width * 3
+    # every row starts with its filter type, 0 for none
+    rows = b"".join(b"\0" + rgb[y * stride:(y + 1) * stride] for y in range(height))
+    return (PNG_SIGNATURE + _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)) +
+            _png_chunk(b"IDAT", zlib.compress(rows, level)) + _png_chunk(b"IEND", b""))
+
+
+class VideoRecorder:
+    """Records the frames of screen passed to capture to path, a directory of png files for the png codec"""
+
+    def __init__(self, path, screen, codec="zlib", buffers=8, level=1):
+        if codec not in CODECS:
+            raise ValueError(f"unknown codec {codec!r}, expected one of {', '.join(CODECS)}")
+        self.path = path
+        self.codec = codec
+        self.level = level
+        self.size = screen.get_size()
+        # buffers in the format of the screen, so copying a frame is a plain copy of its pixels
+        self.free = queue.SimpleQueue()
+        for _ in range(buffers):
+            self.free.put(pygame.Surface(self.size, 0, screen))
+        self.pending = queue.Queue(buffers + 1)
+        self.frames = 0
+        self.written = 0
+        self.dropped = 0
+        self.first_ticks = None
+        if codec == "png":
+            os.makedirs(path, exist_ok=True)
+            self.file = None
+        else:
+            self.file = open(path, "wb")
+            self.file.write(HEADER.pack(MAGIC, VERSION, CODECS.index(codec), *self.size))
+        self.writer = threading.Thread(target=self._write_loop, name="video-writer", daemon=True)
+        self.writer.start()
+
+    def capture(self, screen, ticks):
+        """Copying the frame about to be displayed, ticks is the time of the frame in millis"""
+        if self.first_ticks is None:
+            self.first_ticks = ticks
+        number = self.frames
+        self.frames += 1
+        try:
+            buffer = self.free.get_nowait()
+        except queue.Empty:
+            self.dropped += 1
+            return
+        buffer.blit(screen, (0, 0))
+        self.pending.put_nowait((number, ticks - self.first_ticks, buffer))
+
+    def close(self):
+        """Writing the frames left and stopping the writer"""
+        self.pending.put(None)
+        self.writer.join()
+        if self.file is not None:
+            self.file.close()
+
+    def report(self):
+        return f"video: {self.written} of {self.frames} frames written to {self.path}, {self.dropped} dropped"
+
+    def _write_loop(self):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                return
+            number, millis, buffer = item
+            payload = pygame.image.tostring(buffer, "RGB")
+            if self.codec == "png":
+                with open(os.path.join(self.path, f"frame-{number:07}.png"), "wb") as file:
+                    file.write(encode_png(payload, *self.size, self.level))
+            else:
+                if self.codec == "zlib":
+                    payload = zlib.compress(payload, self.level)
+                self.file.write(FRAME.pack(number, millis, len(payload)))
+                self.file.write(payload)
+            self.free.put(buffer)
+            self.written += 1
+
+
+def read(path):
+    """Yields the (frame number, millis, surface) of each frame of a .trxv recording"""
+    with open(path, "rb") as file:
+        magic, version, codec, width, height = HEADER.unpack(file.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} video recording")
+        while True:
+            header = file.read(FRAME.size)
+            if len(header) < FRAME.size:
+                return
+            number, millis, length = FRAME.unpack(header)
+            payload = file.read(length)
+            if len(payload) < length:
+                raise ValueError(f"{path} is truncated")
+            if CODECS[codec] == "zlib":
+                payload = zlib.decompress(payload)
+            yield number, millis, pygame.image.fromstring(payload, (width, height), "RGB")
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Exports a .trxv video recording to png files")
+    parser.add_argument("recording", help="file recorded with Settings.record_video")
+    parser.add_argument("--frames-dir", help="directory where the frames are saved as png files")
+    args = parser.parse_args(args)
+
+    frames = 0
+    last = -1
+    for number, millis, surface in read(args.recording):
+        if args.frames_dir:
+            os.makedirs(args.frames_dir, exist_ok=True)
+            pygame.image.save(surface, os.path.join(args.frames_dir, f"frame-{number:07}.png"))
+        frames += 1
+        last = number
+    duration = millis / 1000 if frames else 0
+    print(f"{frames} frames, {duration:.1f}s, {last + 1 - frames} dropped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())